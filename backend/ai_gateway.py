@@ -0,0 +1,199 @@
+import asyncio
+import random
+import time
+
+from groq import APIConnectionError, APIStatusError
+
+# Shared manager for outbound Groq calls.
+# Bounds concurrency, paces requests/tokens per minute, retries transient
+# failures (429/5xx/connection) with jittered backoff that honours Retry-After,
+# and opens a circuit breaker when Groq keeps failing so callers can switch to
+# their template / keyword-only fallbacks straight away instead of timing out.
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Groq while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute; acquire() waits for enough units."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Correct an estimate once real usage is known (negative amount refunds)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; one trial call after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release_trial(self):
+        """The trial call ended without a verdict (cancelled); let the next call try again."""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            print(f"Groq circuit breaker OPEN after {self.failures} failures")
+
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, APIConnectionError):  # Includes timeouts
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+class OutboundManager:
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: int = 30, tokens_per_minute: int = 12000,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 breaker: CircuitBreaker = None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.sent = 0
+        self.retries = 0
+        self.rejected = 0  # Calls refused while the breaker was open
+
+    def available(self) -> bool:
+        """False while the breaker is open, so callers can go straight to their fallback."""
+        return not self.breaker.is_open()
+
+    def _backoff(self, attempt: int, error) -> float:
+        # Full jitter, but never earlier than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(delay, min(_retry_after(error), self.max_delay))
+
+    async def call(self, make_call, estimated_tokens: int = 0):
+        """Run make_call() (an awaitable factory) under the limits; raises CircuitOpenError when open.
+
+        The breaker sees one outcome per call, after the retries: a flaky request
+        that needed retries is one failure (or a success), not one per attempt.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("Groq circuit breaker is open")
+
+        try:
+            result = await self._attempts(make_call, estimated_tokens)
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                # Groq answered (bad request / auth problem): no verdict on its health,
+                # so a half-open breaker stays half-open for the next trial
+                self.breaker.release_trial()
+            raise
+        except BaseException:
+            # Cancelled (e.g. a streaming client went away): says nothing about Groq,
+            # but a half-open trial must not stay "running" or the breaker never closes
+            self.breaker.release_trial()
+            raise
+
+        self.breaker.record_success()
+        usage = getattr(result, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.tokens.adjust(usage.total_tokens - estimated_tokens)
+        return result
+
+    async def _attempts(self, make_call, estimated_tokens: int):
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            try:
+                async with self.semaphore:
+                    self.sent += 1
+                    return await make_call()
+            except Exception as e:
+                # Stop early once other calls have opened the breaker
+                if not is_retryable(e) or attempt == self.max_retries or self.breaker.is_open():
+                    raise
+                delay = self._backoff(attempt, e)
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+def estimate_tokens(request: dict) -> int:
+    """Rough prompt + completion size (about 4 characters per token)."""
+    prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+    return prompt_chars // 4 + request.get("max_tokens", 0)
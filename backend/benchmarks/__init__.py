@@ -0,0 +1,3 @@
+# Benchmark suite, run from the backend directory:
+#   python -m benchmarks.run --help
+#   python -m benchmarks.fake_groq --help
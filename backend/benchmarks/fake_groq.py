@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Local stand-in for the Groq chat completions API (OpenAI compatible), so the
+# benchmarks never touch the real service or its rate limits.
+#   python -m benchmarks.fake_groq --port 9000 --latency 400 --error-rate 0.02 --rate-limit-rate 0.05
+# Then run the backend with GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:9000
+
+ANSWER = (
+    "Based on your marks and interests, this course is a strong fit. It builds the core skills "
+    "employers look for, has good placement support and leaves room for higher studies later."
+)
+
+
+def create_app(latency_ms: float = 300.0, jitter_ms: float = 100.0, error_rate: float = 0.0,
+               rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: int = None) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def completion_text(messages) -> str:
+        prompt = messages[-1].get("content", "") if messages else ""
+        # Career mapping prompt: answer with a few names from the course list it sent
+        match = re.search(r"Available Courses:\s*(\[.*?\])\s*\n", prompt, re.DOTALL)
+        if match:
+            try:
+                courses = json.loads(match.group(1))
+            except ValueError:
+                courses = []
+            return json.dumps(rng.sample(courses, min(3, len(courses))))
+        return ANSWER
+
+    def usage(messages, text) -> dict:
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        completion_tokens = len(text) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        await asyncio.sleep(max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000)
+
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            counters["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": str(retry_after)},
+            )
+        if roll < rate_limit_rate + error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": {"message": "Internal server error", "type": "internal_server_error"}},
+                                status_code=500)
+
+        messages = body.get("messages", [])
+        text = completion_text(messages)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage(messages, text),
+            }
+
+        async def chunks():
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0.005)
+            final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return counters
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=300.0, help="Mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=100.0, help="Latency standard deviation in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    uvicorn.run(
+        create_app(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.retry_after, args.seed),
+        host=args.host, port=args.port, log_level="warning",
+    )
@@ -0,0 +1,117 @@
+import random
+
+# Synthetic inputs for the benchmarks: student profiles, chat questions,
+# application forms and larger knowledge bases built from the real one.
+
+STREAM_SUBJECTS = {
+    "Biology": ["Chemistry", "Physics", "Maths", "Biology"],
+    "Computer Science": ["Computer Science", "Physics", "Chemistry", "Maths"],
+    "Commerce": ["Accountancy", "Commerce", "Economics", "Business Maths", "Computer Application"],
+    "Vocational": ["Computer Application", "Agriculture", "Electrical Technology", "Automobile Technology"],
+    "Arts": ["History", "Economics", "Political Science"],
+    "Science": ["Physics", "Chemistry", "Maths"],
+    "General": ["Tamil", "English", "Maths", "Science", "Social Science"],
+}
+
+CAREER_GOALS = [
+    "", "", "", "software engineer", "doctor", "data scientist", "chartered accountant",
+    "civil engineer", "teacher", "ias officer", "game developer", "nurse", "lawyer",
+]
+
+PREFERRED_COURSES = ["", "", "", "", "Computer", "B.Com", "Diploma", "BCA", "Mechanical Engineering", "B.Sc"]
+
+CHAT_QUESTIONS = [
+    "What are the fees for CSE?",
+    "Which colleges offer BCA in Trichy?",
+    "Contact number of M.I.E.T Engineering College",
+    "Eligibility for mechanical engineering after 12th",
+    "Cheapest B.Com course",
+    "Diploma courses after 10th",
+    "Where is the college located that offers B.Sc Microbiology?",
+    "Is there an MBA programme?",
+    "ECE admission cut-off marks",
+    "Which courses can I take with commerce stream?",
+]
+
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Vignesh", "Meena", "Surya", "Lakshmi", "Rahul", "Anitha"]
+COMMUNITIES = ["OC", "BC", "MBC", "SC", "ST"]
+
+
+def _marks(rng: random.Random) -> float:
+    # Mix of a broad spread and the rule engine's threshold values (35/60/65/70/80)
+    if rng.random() < 0.2:
+        return rng.choice([34.9, 35, 59.9, 60, 64.9, 65, 69.9, 70, 79.9, 80])
+    return round(rng.triangular(30, 100, 72), 1)
+
+
+def student_profiles(n: int, seed: int = 1) -> list:
+    """StudentInput-shaped dicts across qualifications, streams and career goals."""
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(n):
+        qualification = rng.choice(["10th", "12th", "12th", "12th", "UG"])
+        stream = "General" if qualification == "10th" else rng.choice(list(STREAM_SUBJECTS))
+        subject_marks = {}
+        for subject in STREAM_SUBJECTS[stream]:
+            if rng.random() < 0.85:
+                subject_marks[subject] = rng.randint(30, 100)
+        profiles.append({
+            "name": f"{rng.choice(FIRST_NAMES)} {i}",
+            "dob": f"{rng.randint(2005, 2009)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "qualification": qualification,
+            "stream": stream,
+            "marks": _marks(rng),
+            "subject_marks": subject_marks,
+            "preferred_course": rng.choice(PREFERRED_COURSES),
+            "career_interest": rng.choice(CAREER_GOALS),
+        })
+    return profiles
+
+
+def chat_messages(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [{"message": rng.choice(CHAT_QUESTIONS)} for _ in range(n)]
+
+
+def application_forms(n: int, colleges: list, seed: int = 1) -> list:
+    """ApplicationInput-shaped dicts; email and phone are unique per form (no duplicate rejections)."""
+    rng = random.Random(seed)
+    forms = []
+    for i in range(n):
+        name = f"{rng.choice(FIRST_NAMES)} {i}"
+        forms.append({
+            "college": rng.choice(colleges),
+            "studentName": name,
+            "parentName": f"Parent of {name}",
+            "email": f"bench{seed}-{i}@example.com",
+            "phone": f"9{(seed * 100000 + i) % 10 ** 9:09d}",
+            "gender": rng.choice(["Male", "Female"]),
+            "dob": "2007-06-15",
+            "community": rng.choice(COMMUNITIES),
+            "address": "12 Main Road, Tiruchirappalli",
+            "qualification": "12th",
+            "stream": rng.choice(["Science", "Commerce", "Arts"]),
+            "marksPercentage": str(_marks(rng)),
+            "courseApplied": rng.choice(["BCA", "B.Com (General)", "Mechanical Engineering", "B.Sc Computer Science"]),
+        })
+    return forms
+
+
+def synthetic_kb(items: list, size: int, seed: int = 1) -> list:
+    """Scale the real KB to `size` courses by cloning it under new campus names with varied fees/cut-offs."""
+    if size <= len(items):
+        return [dict(item) for item in items[:size]]
+    rng = random.Random(seed)
+    scaled = []
+    for i in range(size):
+        item = dict(items[i % len(items)])
+        copy = i // len(items)
+        if copy:
+            item["college_name"] = f"{item['college_name']} Campus {copy}"
+            item["fees"] = max(1000, int(item["fees"] * rng.uniform(0.8, 1.2)))
+            if item.get("minimum_marks") is not None:
+                item["minimum_marks"] = min(100, max(35, item["minimum_marks"] + rng.randint(-5, 5)))
+            if "stream_eligibility" in item:
+                item["stream_eligibility"] = list(item["stream_eligibility"])
+        scaled.append(item)
+    return scaled
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.profiles import application_forms, chat_messages, student_profiles, synthetic_kb
+
+# Benchmark runner. Drives the FastAPI app in-process (httpx ASGI transport, so
+# the numbers are the app's own cost without network noise) and reports
+# p50/p95/p99 latency, throughput and RSS per endpoint for each KB size.
+#   python -m benchmarks.run --kb-sizes 276,10000,100000 --requests 300 --concurrency 16 --fake-groq
+# Without --fake-groq no Groq key is set, so the template / keyword-only paths are measured.
+
+ENDPOINTS = {
+    # name: (method, path, depends on KB size)
+    "suggest": ("POST", "/suggest-admission", True),
+    "chat": ("POST", "/ai-chat", True),
+    "submit": ("POST", "/submit-application", False),
+    "applications": ("GET", "/applications", False),
+}
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def wait_for_port(host: str, port: int, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"fake Groq server did not start on {host}:{port}")
+
+
+async def run_endpoint(client, method: str, path: str, payloads: list, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = list(reversed(payloads))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            payload = queue.pop()
+            start = time.perf_counter()
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def make_payloads(name: str, n: int, seed: int, colleges: list) -> list:
+    if name == "suggest":
+        return student_profiles(n, seed)
+    if name == "chat":
+        return chat_messages(n, seed)
+    if name == "submit":
+        return application_forms(n, colleges, seed)
+    return [{"limit": 100}] * n
+
+
+async def run_suite(args) -> list:
+    import httpx
+    import main
+    from kb_manager import KBSnapshot
+
+    base_items = list(main.kb_manager.snapshot.items)
+    colleges = sorted({item["college_name"] for item in base_items})
+    selected = [name for name in args.endpoints.split(",") if name]
+    results = []
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for position, size in enumerate(int(s) for s in args.kb_sizes.split(",")):
+                started = time.perf_counter()
+                items = synthetic_kb(base_items, size, args.seed)
+                main.kb_manager.snapshot = KBSnapshot(f"bench-{size}", items, main.RULE_ENGINE)
+                build_s = time.perf_counter() - started
+                print(f"\nKB {size} courses (snapshot built in {build_s:.2f}s, RSS {rss_mb():.0f} MB)")
+                print(f"{'endpoint':<14}{'n':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'RSS MB':>9}")
+
+                for name in selected:
+                    method, path, kb_dependent = ENDPOINTS[name]
+                    if not kb_dependent and position > 0:
+                        continue  # DB endpoints don't change with the KB size
+                    seed = args.seed + position * 1000
+                    warmup = make_payloads(name, args.warmup, seed + 500, colleges)
+                    payloads = make_payloads(name, args.requests, seed, colleges)
+                    # The app prints per request; keep it out of the report unless asked for
+                    with open(os.devnull, "w") as devnull, \
+                            contextlib.redirect_stdout(sys.stdout if args.app_output else devnull):
+                        await run_endpoint(client, method, path, warmup, args.concurrency)
+                        result = await run_endpoint(client, method, path, payloads, args.concurrency)
+                    result.update({"endpoint": name, "kb_size": size, "kb_build_s": round(build_s, 3)})
+                    results.append(result)
+                    print(f"{name:<14}{result['requests']:>6}{result['errors']:>6}{result['p50_ms']:>10}"
+                          f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['throughput_rps']:>9}{result['rss_mb']:>9}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Latency / throughput benchmarks for the admission API")
+    parser.add_argument("--endpoints", default="suggest,chat,submit,applications",
+                        help=f"Comma separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--kb-sizes", default="276,10000,100000", help="Comma separated KB sizes (courses)")
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per endpoint and KB size")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--app-output", action="store_true", help="Show the app's print() output")
+    parser.add_argument("--fake-groq", action="store_true", help="Start benchmarks.fake_groq and point the app at it")
+    parser.add_argument("--groq-port", type=int, default=9000)
+    parser.add_argument("--groq-latency", type=float, default=300.0)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-rate-limit-rate", type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    unknown = [name for name in args.endpoints.split(",") if name and name not in ENDPOINTS]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(unknown)}")
+
+    # Throwaway database and email spool; must be set before main is imported
+    workdir = tempfile.mkdtemp(prefix="admission-bench-")
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["EMAIL_SPOOL_DIR"] = os.path.join(workdir, "email_spool")
+    os.environ["KB_WATCH_INTERVAL"] = "0"
+    os.environ["SMTP_USER"] = ""  # Never send real email from a benchmark
+
+    fake_groq = None
+    if args.fake_groq:
+        fake_groq = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_groq", "--port", str(args.groq_port),
+            "--latency", str(args.groq_latency), "--error-rate", str(args.groq_error_rate),
+            "--rate-limit-rate", str(args.groq_rate_limit_rate), "--seed", str(args.seed),
+        ], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        wait_for_port("127.0.0.1", args.groq_port)
+        os.environ["GROQ_API_KEY"] = "fake-key"
+        os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.groq_port}"
+        # Production pacing would dominate the numbers; override explicitly to measure it
+        os.environ.setdefault("GROQ_RPM", "100000")
+        os.environ.setdefault("GROQ_TPM", "100000000")
+    else:
+        os.environ["GROQ_API_KEY"] = ""  # Empty, not unset: load_dotenv must not fill in a real key
+
+    print(f"Benchmark data in {workdir}")
+    try:
+        results = asyncio.run(run_suite(args))
+    finally:
+        if fake_groq is not None:
+            fake_groq.terminate()
+            fake_groq.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from models import CareerMapping
+
+# Cache for analyze_career_goal results.
+# Keyed on the normalized goal plus a hash of the KB course list, so a changed
+# course catalogue invalidates old answers automatically. Entries live in a
+# per-process LRU backed by the career_mappings table, which survives restarts
+# and is shared by all uvicorn workers.
+
+
+def normalize_goal(goal: str) -> str:
+    """'  Software   Engineer! ' -> 'software engineer'"""
+    return " ".join(re.sub(r"[^a-z0-9+#&]+", " ", goal.lower()).split())
+
+
+def course_list_hash(course_names: list) -> str:
+    return hashlib.sha256(json.dumps(sorted(course_names)).encode("utf-8")).hexdigest()[:16]
+
+
+class CareerCache:
+    def __init__(self, session_factory, max_entries: int = 512):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (goal, kb_hash) -> list
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, courses):
+        with self._lock:
+            self._entries[key] = courses
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, goal: str, kb_hash: str):
+        """In-memory lookup only (cheap enough for the event loop). None on miss."""
+        key = (goal, kb_hash)
+        with self._lock:
+            courses = self._entries.get(key)
+            if courses is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+        return courses
+
+    def get_persisted(self, goal: str, kb_hash: str):
+        """SQLite lookup, promotes the entry to memory. None on miss."""
+        db = self.session_factory()
+        try:
+            row = db.get(CareerMapping, (goal, kb_hash))
+        finally:
+            db.close()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        courses = json.loads(row.courses)
+        with self._lock:
+            self.db_hits += 1
+        self._remember((goal, kb_hash), courses)
+        return courses
+
+    def put(self, goal: str, kb_hash: str, courses: list):
+        self._remember((goal, kb_hash), courses)
+        db = self.session_factory()
+        try:
+            db.merge(CareerMapping(goal=goal, kb_hash=kb_hash, courses=json.dumps(courses)))
+            db.commit()
+        except Exception as e:
+            # Another worker may have stored it first; the memory copy is still good
+            db.rollback()
+            print(f"Career cache write failed: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
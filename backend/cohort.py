@@ -0,0 +1,87 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from rule_engine import score_courses, select_top
+import vector_engine
+
+# Process pool for batch (cohort) suggestions.
+# Rule evaluation is pure CPU work, so whole classes are split into chunks and
+# ranked in worker processes instead of on the event loop.
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "50"))
+
+# Worker-side copy of the KB, set once per process by _init_worker
+_features = []
+_fees = []
+_arrays = None
+
+
+def _init_worker(features, fees, arrays):
+    global _features, _fees, _arrays
+    _features = features
+    _fees = fees
+    _arrays = arrays
+
+
+def _rank_chunk(jobs):
+    """Rank a list of (StudentFlags, ai_suggested_courses_lower) jobs inside a worker.
+
+    Only the selected courses go back to the app process, as (eligible_count, selected).
+    """
+    results = []
+    for flags, ai in jobs:
+        if _arrays is not None:
+            candidates = vector_engine.score_courses(_arrays, flags, ai)
+        else:
+            candidates = score_courses(_features, _fees, flags, ai)
+        results.append((len(candidates), select_top(candidates, _features, flags.qualification)))
+    return results
+
+
+class CohortPool:
+    """Lazily started process pool bound to one KB snapshot version."""
+
+    def __init__(self):
+        self._executor = None
+        self._kb_version = None
+
+    def _get_executor(self, kb):
+        # Workers hold their own KB copy, start fresh ones when the KB was reloaded.
+        # The old pool is not cancelled so batches already running on it can finish.
+        if self._executor is None or self._kb_version != kb.version:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS,
+                initializer=_init_worker,
+                initargs=(kb.features, kb.fees, kb.arrays),
+            )
+            self._kb_version = kb.version
+        return self._executor
+
+    async def rank_many(self, kb, jobs):
+        """Yield (job_index, (eligible_count, selected)) for a KBSnapshot as each chunk of jobs finishes."""
+        executor = self._get_executor(kb)
+        loop = asyncio.get_running_loop()
+
+        async def run_chunk(start):
+            chunk = jobs[start:start + BATCH_CHUNK_SIZE]
+            return start, await loop.run_in_executor(executor, _rank_chunk, chunk)
+
+        tasks = [asyncio.ensure_future(run_chunk(start)) for start in range(0, len(jobs), BATCH_CHUNK_SIZE)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                start, results = await next_done
+                for offset, ranked in enumerate(results):
+                    yield start + offset, ranked
+        finally:
+            # Client went away mid-stream: drop chunks that have not started yet
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
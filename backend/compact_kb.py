@@ -0,0 +1,233 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+# Compact, read-only knowledge base.
+# Strings (college names, addresses, contacts, course names, streams) are interned
+# in one table, colleges get integer IDs and every course is a fixed-size binary
+# record. The same bytes can be memory-mapped from knowledge_base.bin, so all
+# uvicorn workers share one copy of the pages and startup skips the JSON parse.
+#
+# Layout (little-endian):
+#   header   "AKB1", n_strings, n_colleges, n_courses
+#   u32 string offsets (n_strings + 1) into the UTF-8 blob at the end
+#   colleges (name_id, address_id, contact_id)
+#   courses  (college_id, course_name_id, fees, minimum_marks, qualification_id, streams_id)
+#   UTF-8 string blob
+#
+# A stream_eligibility list is stored as one interned string joined with STREAM_SEP.
+#
+# Fields outside FIELDS are not stored.
+
+MAGIC = b"AKB1"
+HEADER = struct.Struct("<4sIII")
+U32 = struct.Struct("<I")
+COLLEGE = struct.Struct("<III")
+COURSE = struct.Struct("<IIqdII")
+# The same course record as a numpy dtype, for column access without decoding records
+COURSE_DTYPE = np.dtype([
+    ("college_id", "<u4"), ("name_id", "<u4"), ("fees", "<i8"),
+    ("minimum_marks", "<f8"), ("qualification_id", "<u4"), ("streams_id", "<u4"),
+])
+assert COURSE_DTYPE.itemsize == COURSE.size
+MISSING = 0xFFFFFFFF
+STREAM_SEP = "\x1f"
+
+# Same order as knowledge_base.json, so exports round-trip
+FIELDS = (
+    "college_name", "course_name", "minimum_marks", "stream_eligibility",
+    "qualification_required", "fees", "address", "contact",
+)
+
+
+class CourseRecord(Mapping):
+    """Read-only dict-like view of one course; values are decoded on access."""
+    __slots__ = ("_kb", "_index")
+
+    def __init__(self, kb, index: int):
+        self._kb = kb
+        self._index = index
+
+    @property
+    def college_id(self) -> int:
+        return self._kb.course_row(self._index)[0]
+
+    def __getitem__(self, key):
+        kb = self._kb
+        college_id, name_id, fees, minimum_marks, qualification_id, streams_id = kb.course_row(self._index)
+        if key == "course_name":
+            return kb.string(name_id)
+        if key == "fees":
+            return fees
+        if key in ("college_name", "address", "contact"):
+            value_id = kb.college_row(college_id)[("college_name", "address", "contact").index(key)]
+            if value_id != MISSING:
+                return kb.string(value_id)
+        elif key == "stream_eligibility":
+            if streams_id != MISSING:
+                streams = kb.string(streams_id)
+                return streams.split(STREAM_SEP) if streams else []
+        elif key == "minimum_marks":
+            if not math.isnan(minimum_marks):
+                return int(minimum_marks) if minimum_marks.is_integer() else minimum_marks
+        elif key == "qualification_required":
+            if qualification_id != MISSING:
+                return kb.string(qualification_id)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (field for field in FIELDS if field in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __repr__(self):
+        return f"CourseRecord({dict(self)!r})"
+
+
+class CompactKB(Sequence):
+    """Sequence of CourseRecord over a compact KB buffer (bytes or a read-only mmap)."""
+
+    def __init__(self, buffer, mapped_file=None):
+        self._buffer = buffer
+        self._file = mapped_file
+        magic, n_strings, n_colleges, n_courses = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a compact knowledge base file")
+        self._n_courses = n_courses
+        offset = HEADER.size
+        self._offsets_at = offset
+        offset += U32.size * (n_strings + 1)
+        self._colleges_at = offset
+        offset += COLLEGE.size * n_colleges
+        self._courses_at = offset
+        self._blob_at = offset + COURSE.size * n_courses
+        self.n_colleges = n_colleges
+
+    @classmethod
+    def open(cls, path: str) -> "CompactKB":
+        """Memory-map a knowledge_base.bin read-only (pages are shared between processes)."""
+        f = open(path, "rb")
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        return cls(mapped, f)
+
+    @classmethod
+    def from_items(cls, items: list) -> "CompactKB":
+        return cls(encode(items))
+
+    def string(self, string_id: int) -> str:
+        start, end = struct.unpack_from("<II", self._buffer, self._offsets_at + U32.size * string_id)
+        return bytes(self._buffer[self._blob_at + start:self._blob_at + end]).decode("utf-8")
+
+    def college_row(self, college_id: int) -> tuple:
+        return COLLEGE.unpack_from(self._buffer, self._colleges_at + COLLEGE.size * college_id)
+
+    @property
+    def columns(self) -> np.ndarray:
+        """All course records as a structured array over the buffer (a view, nothing is copied)."""
+        return np.frombuffer(self._buffer, dtype=COURSE_DTYPE, count=self._n_courses, offset=self._courses_at)
+
+    def course_row(self, index: int) -> tuple:
+        return COURSE.unpack_from(self._buffer, self._courses_at + COURSE.size * index)
+
+    def digest(self) -> str:
+        return hashlib.sha256(self._buffer).hexdigest()
+
+    def __len__(self):
+        return self._n_courses
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return CourseRecord(self, index)
+
+    def to_dicts(self) -> list:
+        return [dict(record) for record in self]
+
+
+def encode(items: list) -> bytes:
+    """Serialize KB dicts into the compact binary layout."""
+    strings = {}
+    colleges = {}
+
+    def intern(value):
+        if value is None:
+            return MISSING
+        return strings.setdefault(str(value), len(strings))
+
+    courses = []
+    for item in items:
+        college_key = (item["college_name"], item.get("address"), item.get("contact"))
+        if college_key not in colleges:
+            colleges[college_key] = (len(colleges), tuple(intern(v) for v in college_key))
+        streams = item.get("stream_eligibility")
+        minimum_marks = item.get("minimum_marks")
+        courses.append((
+            colleges[college_key][0],
+            intern(item["course_name"]),
+            int(item["fees"]),
+            float("nan") if minimum_marks is None else float(minimum_marks),
+            intern(item.get("qualification_required")),
+            MISSING if streams is None else intern(STREAM_SEP.join(streams)),
+        ))
+
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    parts = [HEADER.pack(MAGIC, len(strings), len(colleges), len(courses))]
+    parts.extend(U32.pack(o) for o in offsets)
+    parts.extend(COLLEGE.pack(*ids) for _, ids in colleges.values())
+    parts.extend(COURSE.pack(*course) for course in courses)
+    parts.extend(blobs)
+    return b"".join(parts)
+
+
+def write_compact_kb(items: list, path: str):
+    """Write knowledge_base.bin atomically (workers mapping the old file keep their pages)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode(items))
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # python compact_kb.py [knowledge_base.json | db] [knowledge_base.bin]
+    # The default source "db" exports the catalogue from the database (kb_store.py)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    source = sys.argv[1] if len(sys.argv) > 1 else "db"
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, "knowledge_base.bin")
+    if source == "db":
+        from database import SessionLocal
+        from kb_store import export_items
+        with SessionLocal() as session:
+            kb_items = export_items(session)
+    else:
+        from kb_manager import validate_kb
+        with open(source, "r") as f:
+            kb_items = validate_kb(json.load(f))
+    write_compact_kb(kb_items, target)
+    print(f"Wrote {len(kb_items)} courses to {target} ({os.path.getsize(target)} bytes)")
@@ -0,0 +1,78 @@
+import json
+
+# Compact serialization of retrieved KB records for the /ai-chat system prompt.
+# Records are grouped by college so college metadata appears once, fields the
+# question doesn't ask about are dropped, and rows stop at a token budget.
+
+CONTACT_WORDS = ("contact", "phone", "call", "number", "mobile", "email", "reach")
+ADDRESS_WORDS = ("address", "location", "located", "where", "place", "area", "map", "near")
+ELIGIBILITY_WORDS = ("eligib", "mark", "cutoff", "cut-off", "percent", "%", "stream", "qualif", "require", "criteria", "admission")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return len(text) // 4
+
+
+def _wants(question: str, words) -> bool:
+    return any(w in question for w in words)
+
+
+def pack_context(question: str, records: list, token_budget: int = 800):
+    """Returns (packed_text, stats) where stats has the before/after token estimates."""
+    question = question.lower()
+    with_contact = _wants(question, CONTACT_WORDS)
+    with_address = _wants(question, ADDRESS_WORDS)
+    with_eligibility = _wants(question, ELIGIBILITY_WORDS)
+
+    # Group courses under their college, keeping retrieval order
+    colleges = {}
+    for record in records:
+        college = record.get("college_name") or record.get("college")  # KB record or overview entry
+        colleges.setdefault(college, {"meta": record, "courses": []})["courses"].append(record)
+
+    lines = []
+    used = 0
+    packed_rows = 0
+    for college, group in colleges.items():
+        meta = group["meta"]
+        header = f"## {college}"
+        if with_address and meta.get("address"):
+            header += f" | Address: {meta['address']}"
+        if with_contact and meta.get("contact"):
+            header += f" | Contact: {meta['contact']}"
+        header_cost = estimate_tokens(header) + 1
+        if used + header_cost > token_budget:
+            break
+        lines.append(header)
+        used += header_cost
+
+        for record in group["courses"]:
+            row = f"- {record.get('course_name', record.get('course'))}"
+            if "fees" in record:
+                row += f" | Fees Rs.{record['fees']}"
+            if with_eligibility:
+                if record.get("minimum_marks") is not None:
+                    row += f" | Min {record['minimum_marks']}%"
+                if record.get("stream_eligibility"):
+                    row += f" | Streams: {', '.join(record['stream_eligibility'])}"
+                if record.get("qualification_required"):
+                    row += f" | After {record['qualification_required']}"
+            row_cost = estimate_tokens(row) + 1
+            if used + row_cost > token_budget:
+                break
+            lines.append(row)
+            used += row_cost
+            packed_rows += 1
+        else:
+            continue
+        break  # Budget ran out inside this college
+
+    text = "\n".join(lines)
+    stats = {
+        "records": len(records),
+        "packed_records": packed_rows,
+        "tokens_before": estimate_tokens(json.dumps(records, default=dict)),  # default: CompactKB records
+        "tokens_after": estimate_tokens(text),
+    }
+    return text, stats
@@ -0,0 +1,92 @@
+from typing import NamedTuple
+
+# Precomputed course flags for the admission rules.
+# Every course-name check in suggest_admission depends only on the knowledge
+# base, so they are worked out once in load_kb() instead of on every request.
+
+# RULE 2 degree categories (same precedence as the original elif chain)
+CATEGORY_OTHER = 0
+CATEGORY_ENGINEERING = 1
+CATEGORY_BSC = 2
+CATEGORY_BCA = 3
+CATEGORY_COMMERCE = 4
+CATEGORY_ARTS = 5
+
+# B.Sc sub-categories
+BSC_GENERAL = 0
+BSC_COMPUTER = 1
+BSC_BIO = 2
+
+# 12th grade balancing buckets (response shows up to 20 / 20 / 20 / 10 of each)
+BUCKET_ENGINEERING = 0
+BUCKET_ARTS = 1
+BUCKET_DIPLOMA = 2
+BUCKET_OTHER = 3
+
+
+class CourseFeatures(NamedTuple):
+    name_lower: str
+    is_diploma: bool
+    category: int
+    bsc_kind: int
+    is_bio_engineering: bool    # Biomedical / Biotech (open to Bio students without Maths)
+    is_computer: bool           # CSE style branches need Maths/Computer Sc.
+    is_engineering: bool        # Literal "engineering" (percentage rules + subject scoring)
+    is_high_demand: bool        # CSE/ECE/Data need 65%+
+    is_bio: bool                # Biology subject boost
+    is_computer_career: bool    # Career boost for software/coding goals
+    is_medical_career: bool     # Career boost for doctor/medical goals
+    stream_eligibility: frozenset
+    balance_bucket: int         # 12th grade balancing bucket
+
+
+def build_course_features(item: dict) -> CourseFeatures:
+    """Classify a single KB entry using the same substring checks the rules used to run per request."""
+    name = item["course_name"].lower()
+
+    if any(x in name for x in ["engineering", "b.e", "b.tech"]):
+        category = CATEGORY_ENGINEERING
+    elif "b.sc" in name:
+        category = CATEGORY_BSC
+    elif "bca" in name:
+        category = CATEGORY_BCA
+    elif "b.com" in name or "bba" in name:
+        category = CATEGORY_COMMERCE
+    elif "b.a" in name or "arts" in name:
+        category = CATEGORY_ARTS
+    else:
+        category = CATEGORY_OTHER
+
+    if "computer" in name or "data" in name:
+        bsc_kind = BSC_COMPUTER
+    elif "bio" in name or "microbiology" in name:
+        bsc_kind = BSC_BIO
+    else:
+        bsc_kind = BSC_GENERAL
+
+    # The balancing also used to check for "lateral" in the match reason, but for
+    # 12th grade that note is only added to diplomas, so the name check covers it.
+    if "diploma" in name:
+        balance_bucket = BUCKET_DIPLOMA
+    elif any(x in name for x in ["b.e", "b.tech", "engineering", "archi"]):
+        balance_bucket = BUCKET_ENGINEERING
+    elif any(x in name for x in ["b.sc", "b.a", "b.com", "bba", "bca", "arts"]):
+        balance_bucket = BUCKET_ARTS
+    else:
+        balance_bucket = BUCKET_OTHER
+
+    return CourseFeatures(
+        name_lower=name,
+        is_diploma="diploma" in name,
+        category=category,
+        bsc_kind=bsc_kind,
+        is_bio_engineering="biomedical" in name or "biotech" in name,
+        is_computer="computer" in name,
+        is_engineering="engineering" in name,
+        is_high_demand=any(x in name for x in ["cse", "computer science", "data", "electronics"]),
+        is_bio="bio" in name,
+        is_computer_career="computer" in name or "bca" in name or "data" in name,
+        is_medical_career="bio" in name or "medical" in name,
+        stream_eligibility=frozenset(item.get("stream_eligibility", [])),
+        balance_bucket=balance_bucket,
+    )
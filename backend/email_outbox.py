@@ -0,0 +1,248 @@
+import asyncio
+import datetime
+import logging
+import os
+import random
+import smtplib
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import func, select, update
+
+from models import EmailOutbox
+from metrics import EMAIL_MESSAGES
+
+# Transactional email outbox.
+# submit_application only inserts an EmailOutbox row (in the same transaction as
+# the application). OutboxWorker drains pending rows in batches over one
+# long-lived SMTP connection, retries transient failures with backoff and marks
+# messages "dead" once retrying is pointless. Without SMTP credentials messages
+# go to a rotating spool file instead. Several app workers can drain the same
+# table: a row is claimed by moving next_attempt_at forward (a lease) with a
+# compare-and-set update, so only one of them sends it.
+
+# Connection-level problems: drop the connection and retry the batch later.
+# (smtplib errors are OSErrors too, so permanent ones are checked first.)
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError, OSError)
+
+
+def is_permanent(error) -> bool:
+    """Errors caused by the message itself (bad recipient, 5xx reply), retrying won't help."""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def build_message(row, sender: str) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender
+    msg['To'] = row.to_address
+    msg['Subject'] = row.subject
+    msg.attach(MIMEText(row.text_body or "", 'plain'))
+    if row.html_body:
+        msg.attach(MIMEText(row.html_body, 'html'))
+    return msg
+
+
+class SmtpConnection:
+    """One authenticated SMTP session, reused for every message until it drops or idles out."""
+
+    def __init__(self, host: str, port: int, user: str, password: str, starttls: bool = True, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password.replace(" ", ""))
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+
+    def send(self, msg):
+        if self.server is None:
+            self._connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed an idle session; reconnect once
+            self.close()
+            self._connect()
+            self.server.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                self.server.close()
+            self.server = None
+
+
+class EmailSpool:
+    """Simulated delivery: full MIME messages appended to a size-rotated spool file."""
+
+    def __init__(self, directory: str, max_bytes: int, backups: int):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "outbox.eml.log")
+        self.logger = logging.getLogger("email_spool")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def write(self, row_id: int, msg):
+        self.logger.info(f"----- outbox id {row_id} at {datetime.datetime.utcnow().isoformat()} -----\n{msg.as_string()}\n")
+
+
+class OutboxWorker:
+    def __init__(self, session_factory, smtp_host: str, smtp_port: int, smtp_user: str, smtp_password: str,
+                 starttls: bool = True, batch_size: int = 20, poll_interval: float = 2.0, max_attempts: int = 6,
+                 retry_base: float = 30.0, retry_max: float = 3600.0, claim_lease: float = 300.0,
+                 idle_close: float = 60.0, spool_dir: str = "email_spool",
+                 spool_max_bytes: int = 5_000_000, spool_backups: int = 5):
+        self.session_factory = session_factory
+        self.sender = smtp_user if smtp_user else "admission@college.edu"
+        # Same rule as before the outbox: no credentials means simulate
+        self.simulated = not smtp_user or not smtp_password
+        self.connection = SmtpConnection(smtp_host, smtp_port, smtp_user, smtp_password, starttls)
+        self.spool = EmailSpool(spool_dir, spool_max_bytes, spool_backups) if self.simulated else None
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_lease = datetime.timedelta(seconds=claim_lease)
+        self.idle_close = idle_close
+        self._wake = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+
+    def notify(self):
+        """Called after an application commits so the email goes out without waiting for the next poll."""
+        self._wake.set()
+
+    def _backoff(self, attempts: int) -> datetime.timedelta:
+        delay = min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+        return datetime.timedelta(seconds=random.uniform(delay / 2, delay))
+
+    async def _claim(self) -> list:
+        now = datetime.datetime.utcnow()
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.id)
+                .limit(self.batch_size)
+            )).scalars().all()
+            claimed = []
+            for row in rows:
+                result = await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id == row.id, EmailOutbox.next_attempt_at == row.next_attempt_at)
+                    .values(next_attempt_at=now + self.claim_lease)
+                )
+                if result.rowcount == 1:  # Otherwise another worker got it first
+                    claimed.append(row)
+            await db.commit()
+        return claimed
+
+    def _send_batch(self, rows) -> list:
+        """Blocking, runs in a worker thread. Returns [(row, error_or_None)]."""
+        results = []
+        for position, row in enumerate(rows):
+            msg = build_message(row, self.sender)
+            try:
+                if self.simulated:
+                    self.spool.write(row.id, msg)
+                else:
+                    self.connection.send(msg)
+            except Exception as e:
+                if isinstance(e, CONNECTION_ERRORS) and not is_permanent(e):
+                    # Not this message's fault (server unreachable, 4xx): retry the rest later too
+                    self.connection.close()
+                    results.extend((rest, e) for rest in rows[position:])
+                    break
+                results.append((row, e))
+                continue
+            results.append((row, None))
+        return results
+
+    async def _record(self, results):
+        now = datetime.datetime.utcnow()
+        async with self.session_factory() as db:
+            for row, error in results:
+                attempts = row.attempts + 1
+                if error is None:
+                    values = {"status": "sent", "attempts": attempts, "sent_at": now, "last_error": None}
+                    self.sent += 1
+                    EMAIL_MESSAGES.inc("simulated" if self.simulated else "sent")
+                elif is_permanent(error) or attempts >= self.max_attempts:
+                    values = {"status": "dead", "attempts": attempts, "last_error": str(error)}
+                    self.dead += 1
+                    EMAIL_MESSAGES.inc("dead")
+                    print(f"Email {row.id} to {row.to_address} dead-lettered after {attempts} attempts: {error}")
+                else:
+                    values = {"attempts": attempts, "next_attempt_at": now + self._backoff(attempts), "last_error": str(error)}
+                    self.failed += 1
+                    EMAIL_MESSAGES.inc("retry")
+                    print(f"Email {row.id} to {row.to_address} failed (attempt {attempts}), will retry: {error}")
+                await db.execute(update(EmailOutbox).where(EmailOutbox.id == row.id).values(**values))
+            await db.commit()
+
+    async def drain_once(self) -> int:
+        """Send one batch. Returns the number of messages attempted."""
+        rows = await self._claim()
+        if rows:
+            await self._record(await asyncio.to_thread(self._send_batch, rows))
+        return len(rows)
+
+    async def run(self):
+        """Drain until cancelled."""
+        while True:
+            self._wake.clear()  # Before draining, so a notify() during the batch is not lost
+            try:
+                if await self.drain_once() == self.batch_size:
+                    continue  # Probably more waiting
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+            if self.connection.server is not None and time.monotonic() - self.connection.last_used > self.idle_close:
+                await asyncio.to_thread(self.connection.close)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        self.connection.close()
+
+    async def stats(self) -> dict:
+        async with self.session_factory() as db:
+            counts = dict((await db.execute(
+                select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+            )).all())
+        return {
+            "mode": "simulated" if self.simulated else "smtp",
+            "queue": counts,
+            "sent": self.sent,
+            "failed_attempts": self.failed,
+            "dead": self.dead,
+        }
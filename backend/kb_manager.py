@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from course_features import build_course_features
+from retrieval import CompactCourseIndex, CourseIndex
+from career_cache import course_list_hash
+from compact_kb import CompactKB
+import kb_store
+import vector_engine
+
+# Hot-reloadable knowledge base.
+# Everything derived from the course catalogue (rule features, numpy columns, chat
+# index, career prompt course list) is built into one immutable, versioned
+# KBSnapshot. A change builds the new snapshot off the event loop and publishes it
+# by swapping a single reference, so requests that already hold the old snapshot
+# finish with it undisturbed. Admin edits to single courses are applied with
+# KBSnapshot.apply_changes, which re-derives only the changed courses.
+
+REQUIRED_FIELDS = {"college_name": str, "course_name": str, "fees": int}
+
+_KEEP = object()
+
+
+def compact_derived(kb: CompactKB) -> tuple:
+    """(features, fees, course_name_counts) for a compact KB, read from its id columns.
+
+    Course features only depend on the course name and stream list, both interned in
+    the compact file, so each distinct pair is classified once and its CourseFeatures
+    shared by every course that has it. Fees are a packed array, not one int per course.
+    """
+    columns = kb.columns
+    shared = {}
+    features = []
+    for position, key in enumerate(zip(columns["name_id"].tolist(), columns["streams_id"].tolist())):
+        course_features = shared.get(key)
+        if course_features is None:
+            course_features = shared[key] = build_course_features(kb[position])
+        features.append(course_features)
+    fees = array("q")
+    fees.frombytes(np.ascontiguousarray(columns["fees"]).tobytes())
+    name_ids, counts = np.unique(columns["name_id"], return_counts=True)
+    course_name_counts = Counter({kb.string(name_id): count for name_id, count in zip(name_ids.tolist(), counts.tolist())})
+    return tuple(features), fees, course_name_counts
+
+
+class KBSnapshot:
+    __slots__ = (
+        "version", "items", "features", "fees", "arrays", "index", "rule_engine",
+        "course_ids", "positions", "course_name_counts",
+        "career_course_names", "career_courses_hash", "loaded_at",
+    )
+
+    def __init__(self, version: str, items, rule_engine: str = "loop", course_ids=None):
+        """course_ids: database ids in the same order as items (None for file based KBs)."""
+        course_ids = tuple(course_ids) if course_ids is not None else None
+        if isinstance(items, CompactKB):
+            # Nothing per course but references into the mapped records (see compact_derived)
+            features, fees, course_name_counts = compact_derived(items)
+            index = CompactCourseIndex(items)
+        else:
+            items = tuple(items)
+            features = tuple(build_course_features(item) for item in items)
+            fees = tuple(item["fees"] for item in items)
+            course_name_counts = Counter(item["course_name"] for item in items)
+            index = CourseIndex(items, course_ids)
+        arrays = vector_engine.CourseArrays(features, items) if rule_engine == "numpy" and items else None
+        self._publish(
+            version, items, features, fees, arrays, index, rule_engine, course_ids, course_name_counts,
+        )
+
+    def _publish(self, version, items, features, fees, arrays, index, rule_engine, course_ids, course_name_counts):
+        career_course_names = sorted(course_name_counts)
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "items", items)
+        object.__setattr__(self, "features", features)
+        object.__setattr__(self, "fees", fees)
+        object.__setattr__(self, "arrays", arrays)
+        object.__setattr__(self, "index", index)
+        object.__setattr__(self, "rule_engine", rule_engine)
+        object.__setattr__(self, "course_ids", course_ids)
+        object.__setattr__(self, "positions", {cid: p for p, cid in enumerate(course_ids)} if course_ids is not None else None)
+        object.__setattr__(self, "course_name_counts", course_name_counts)
+        object.__setattr__(self, "career_course_names", career_course_names)
+        object.__setattr__(self, "career_courses_hash", course_list_hash(career_course_names))
+        object.__setattr__(self, "loaded_at", time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("KBSnapshot is immutable, build a new one instead")
+
+    def __len__(self):
+        return len(self.items)
+
+    def apply_changes(self, version: str, changes: dict) -> "KBSnapshot":
+        """New snapshot with changes ({course_id: record, or None when retired}) applied.
+
+        Only changed courses get new features, index postings and numpy rows; the
+        rest is carried over. New courses are appended, which keeps KB order equal
+        to course id order as long as their ids are higher than the current ones.
+        Raises ValueError when the change can't be applied incrementally (the
+        caller then rebuilds from scratch).
+        """
+        if self.course_ids is None or isinstance(self.items, CompactKB):
+            raise ValueError("snapshot was not loaded from the database")
+        last_id = self.course_ids[-1] if self.course_ids else 0
+        added = sorted(cid for cid, item in changes.items() if item is not None and cid not in self.positions)
+        if added and added[0] <= last_id:
+            raise ValueError(f"course {added[0]} would not be appended in id order")
+
+        # source: position in this snapshot for each new position (-1 for added courses)
+        course_ids = []
+        source = []
+        for position, course_id in enumerate(self.course_ids):
+            if changes.get(course_id, _KEEP) is not None:
+                course_ids.append(course_id)
+                source.append(position)
+        course_ids.extend(added)
+        source.extend([-1] * len(added))
+
+        items = [self.items[p] if p >= 0 else None for p in source]
+        features = [self.features[p] if p >= 0 else None for p in source]
+        fees = [self.fees[p] if p >= 0 else None for p in source]
+        dirty = [p for p, cid in enumerate(course_ids) if cid in changes]
+        for p in dirty:
+            items[p] = changes[course_ids[p]]
+            features[p] = build_course_features(items[p])
+            fees[p] = items[p]["fees"]
+
+        course_name_counts = Counter(self.course_name_counts)
+        for course_id in changes:
+            if course_id in self.positions:
+                course_name_counts[self.items[self.positions[course_id]]["course_name"]] -= 1
+            if changes[course_id] is not None:
+                course_name_counts[changes[course_id]["course_name"]] += 1
+        course_name_counts = +course_name_counts  # Drop names no course uses any more
+
+        if self.arrays is not None and items:
+            arrays = self.arrays.patched(features, items, np.array(source, dtype=np.int64), dirty)
+        elif self.rule_engine == "numpy" and items:
+            arrays = vector_engine.CourseArrays(features, items)
+        else:
+            arrays = None
+
+        snapshot = object.__new__(KBSnapshot)
+        snapshot._publish(
+            version, tuple(items), tuple(features), tuple(fees), arrays,
+            self.index.updated(changes), self.rule_engine, tuple(course_ids), course_name_counts,
+        )
+        return snapshot
+
+
+def validate_kb(data) -> list:
+    """Check the parsed JSON before it is allowed to replace the live KB. Raises ValueError."""
+    if not isinstance(data, list):
+        raise ValueError("knowledge base must be a JSON list of courses")
+    for position, item in enumerate(data):
+        if not isinstance(item, dict):
+            raise ValueError(f"entry {position} is not an object")
+        for field, field_type in REQUIRED_FIELDS.items():
+            if not isinstance(item.get(field), field_type):
+                raise ValueError(f"entry {position} has missing or invalid '{field}'")
+        if not isinstance(item.get("stream_eligibility", []), list):
+            raise ValueError(f"entry {position} has invalid 'stream_eligibility'")
+    return data
+
+
+class KBManager:
+    """Owns the live KBSnapshot of this worker.
+
+    kb_format: "json" (list of dicts, patched per changed course), "compact" (a
+    CompactKB rebuilt from the database on every change) or "binary" (a read-only
+    knowledge_base.bin opened with mmap and shared by all workers; it is watched
+    for changes on disk and not affected by the database catalogue).
+    With the json / compact formats the catalogue lives in the database
+    (kb_store.py) and seed_path seeds it while it is still empty.
+    """
+
+    # More changed courses than this in one poll are cheaper to load in one go
+    MAX_INCREMENTAL_CHANGES = 1000
+
+    def __init__(self, session_factory, seed_path: str, rule_engine: str = "loop", poll_interval: float = 2.0,
+                 kb_format: str = "json", binary_path: str = None):
+        self.session_factory = session_factory
+        self.seed_path = seed_path
+        self.binary_path = binary_path
+        self.rule_engine = rule_engine
+        self.kb_format = kb_format
+        self.poll_interval = poll_interval
+        self.snapshot = KBSnapshot("empty", [], rule_engine)
+        self.change_id = 0  # Last kb_changes row reflected in the snapshot
+        self._generation = 0
+        self._file_signature = None
+        self._reload_lock = asyncio.Lock()
+
+    @property
+    def database_backed(self) -> bool:
+        return self.kb_format != "binary"
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.binary_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _build_binary(self) -> KBSnapshot:
+        """Map the knowledge_base.bin (blocking). Validated when the .bin was written; pages are mapped, not parsed."""
+        items = CompactKB.open(self.binary_path)
+        self._generation += 1
+        return KBSnapshot(f"{self._generation}-{items.digest()[:8]}", items, self.rule_engine)
+
+    def _seed(self):
+        """Import seed_path into an empty catalogue (first start after upgrading)."""
+        with self.session_factory() as session:
+            if kb_store.count_courses(session) or not os.path.exists(self.seed_path):
+                return
+            with open(self.seed_path, "rb") as f:
+                items = validate_kb(json.loads(f.read()))
+            count = kb_store.replace_catalogue(session, items)
+            session.commit()
+        print(f"Knowledge base: imported {count} courses from {self.seed_path}")
+
+    def _build_from_db(self) -> KBSnapshot:
+        """Load the whole catalogue (blocking, run in a worker thread)."""
+        with self.session_factory() as session:
+            # Read the change id first: a change landing in between is applied again later, never lost
+            change_id = kb_store.latest_change_id(session)
+            rows = kb_store.load_items(session)
+        course_ids = [course_id for course_id, _ in rows]
+        items = [item for _, item in rows]
+        if self.kb_format == "compact":
+            items = CompactKB.from_items(items)
+        snapshot = KBSnapshot(f"db-{change_id}", items, self.rule_engine, course_ids)
+        self.change_id = change_id
+        return snapshot
+
+    def _apply_changes(self):
+        """Snapshot with the kb_changes since the last poll applied, or None if nothing changed (blocking)."""
+        with self.session_factory() as session:
+            changes = kb_store.changes_since(session, self.change_id)
+            if not changes:
+                return None
+            course_ids = {course_id for _, course_id in changes}
+            incremental = (self.kb_format == "json" and None not in course_ids
+                           and len(course_ids) <= self.MAX_INCREMENTAL_CHANGES and self.snapshot.course_ids is not None)
+            if incremental:
+                change_id = changes[-1][0]
+                items = dict(kb_store.load_items(session, course_ids))
+        if not incremental:
+            return self._build_from_db()
+        try:
+            snapshot = self.snapshot.apply_changes(
+                f"db-{change_id}", {course_id: items.get(course_id) for course_id in course_ids},
+            )
+        except ValueError as e:
+            print(f"Knowledge base: full reload ({e})")
+            return self._build_from_db()
+        self.change_id = change_id
+        return snapshot
+
+    def load(self) -> KBSnapshot:
+        """Synchronous load, used once at startup."""
+        if not self.database_backed:
+            signature = self._signature()
+            if signature is None:
+                print(f"Warning: {self.binary_path} not found.")
+                return self.snapshot
+            self.snapshot = self._build_binary()
+            self._file_signature = signature
+            return self.snapshot
+        self._seed()
+        self.snapshot = self._build_from_db()
+        return self.snapshot
+
+    async def sync(self) -> bool:
+        """Apply catalogue changes made through any worker since the last call."""
+        async with self._reload_lock:
+            try:
+                snapshot = await asyncio.to_thread(self._apply_changes)
+            except Exception as e:
+                # Keep serving the current snapshot; the changes are picked up on the next poll
+                print(f"Knowledge base update failed, keeping version {self.snapshot.version}: {e}")
+                return False
+            if snapshot is None:
+                return False
+            self.snapshot = snapshot  # Single reference swap publishes everything at once
+            print(f"Knowledge base updated: version {snapshot.version} ({len(snapshot)} courses)")
+            return True
+
+    async def reload_if_changed(self) -> bool:
+        """Binary format: remap knowledge_base.bin after it was rewritten."""
+        async with self._reload_lock:
+            signature = self._signature()
+            if signature is None or signature == self._file_signature:
+                return False
+            try:
+                snapshot = await asyncio.to_thread(self._build_binary)
+            except (OSError, ValueError) as e:
+                # Keep serving the current snapshot; retry when the file changes again
+                print(f"Knowledge base reload failed, keeping version {self.snapshot.version}: {e}")
+                self._file_signature = signature
+                return False
+            self._file_signature = signature
+            self.snapshot = snapshot
+            print(f"Knowledge base reloaded: version {snapshot.version} ({len(snapshot)} courses)")
+            return True
+
+    async def watch(self):
+        """Poll for catalogue changes (kb_changes, or the .bin file) until cancelled."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self.database_backed:
+                await self.sync()
+            else:
+                await self.reload_if_changed()
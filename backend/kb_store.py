@@ -0,0 +1,228 @@
+import datetime
+import json
+import os
+import sys
+
+from sqlalchemy import delete, func, insert, select, update
+
+from compact_kb import FIELDS
+from models import College, Course, CourseStream, KBChange
+
+# Knowledge base tables (colleges, courses, course_streams) next to the applications.
+# They are the source of truth for the catalogue; knowledge_base.json is only the
+# import / export format (and seeds an empty database). Every write also adds a
+# kb_changes row in the same transaction. App workers poll that log and patch
+# their in-memory KBSnapshot for just the changed courses (see kb_manager.py).
+#
+# Functions take a sync Session; async handlers call them with AsyncSession.run_sync.
+# The caller commits.
+
+# Editable course fields (college_name moves the course to another college)
+COURSE_FIELDS = ("college_name", "course_name", "fees", "minimum_marks", "qualification_required", "stream_eligibility")
+
+# Bound parameters per IN (...) query, well below SQLite's limit
+ID_CHUNK = 500
+
+
+def to_item(row, streams: list) -> dict:
+    """Course row -> KB record with the keys in knowledge_base.json order; NULL fields are left out."""
+    minimum_marks = row.minimum_marks
+    if minimum_marks is not None and float(minimum_marks).is_integer():
+        minimum_marks = int(minimum_marks)
+    values = {
+        "college_name": row.college_name,
+        "course_name": row.course_name,
+        "minimum_marks": minimum_marks,
+        "stream_eligibility": streams,
+        "qualification_required": row.qualification_required,
+        "fees": row.fees,
+        "address": row.address,
+        "contact": row.contact,
+    }
+    return {field: values[field] for field in FIELDS if values[field] is not None}
+
+
+def _course_query():
+    return (
+        select(
+            Course.id, College.name.label("college_name"), Course.course_name, Course.minimum_marks,
+            Course.qualification_required, Course.fees, College.address, College.contact,
+        )
+        .join(College, Course.college_id == College.id)
+        .where(Course.retired.is_(False))
+    )
+
+
+def _streams(session, course_ids=None) -> dict:
+    query = select(CourseStream.course_id, CourseStream.stream).order_by(CourseStream.course_id, CourseStream.position)
+    if course_ids is not None:
+        query = query.where(CourseStream.course_id.in_(course_ids))
+    streams = {}
+    for course_id, stream in session.execute(query):
+        streams.setdefault(course_id, []).append(stream)
+    return streams
+
+
+def load_items(session, course_ids=None) -> list:
+    """(course_id, record) for the active courses in KB order, optionally only the given ids."""
+    if course_ids is None:
+        rows = session.execute(_course_query().order_by(Course.id)).all()
+        streams = _streams(session)
+        return [(row.id, to_item(row, streams.get(row.id, []))) for row in rows]
+
+    course_ids = sorted(course_ids)
+    items = []
+    for start in range(0, len(course_ids), ID_CHUNK):
+        chunk = course_ids[start:start + ID_CHUNK]
+        rows = session.execute(_course_query().where(Course.id.in_(chunk)).order_by(Course.id)).all()
+        streams = _streams(session, chunk)
+        items.extend((row.id, to_item(row, streams.get(row.id, []))) for row in rows)
+    return items
+
+
+def export_items(session) -> list:
+    """The active catalogue in knowledge_base.json format."""
+    return [item for _, item in load_items(session)]
+
+
+def count_courses(session) -> int:
+    return session.scalar(select(func.count()).select_from(Course))
+
+
+def latest_change_id(session) -> int:
+    return session.scalar(select(func.max(KBChange.id))) or 0
+
+
+def changes_since(session, after_id: int) -> list:
+    """(change_id, course_id) rows after after_id; course_id None means reload everything."""
+    return session.execute(
+        select(KBChange.id, KBChange.course_id).where(KBChange.id > after_id).order_by(KBChange.id)
+    ).all()
+
+
+def _college_id(session, name: str, address=None, contact=None) -> int:
+    """Existing college by name, or a new one (address / contact only apply to new colleges)."""
+    college_id = session.scalar(select(College.id).where(College.name == name))
+    if college_id is None:
+        college = College(name=name, address=address, contact=contact)
+        session.add(college)
+        session.flush()
+        college_id = college.id
+    return college_id
+
+
+def _set_streams(session, course_id: int, streams: list):
+    session.execute(delete(CourseStream).where(CourseStream.course_id == course_id))
+    for position, stream in enumerate(streams):
+        session.add(CourseStream(course_id=course_id, position=position, stream=stream))
+
+
+def add_course(session, item: dict) -> int:
+    """Insert one course from a KB-style record; returns its id."""
+    course = Course(
+        college_id=_college_id(session, item["college_name"], item.get("address"), item.get("contact")),
+        course_name=item["course_name"],
+        fees=item["fees"],
+        minimum_marks=item.get("minimum_marks"),
+        qualification_required=item.get("qualification_required"),
+    )
+    session.add(course)
+    session.flush()
+    _set_streams(session, course.id, item.get("stream_eligibility", []))
+    session.add(KBChange(course_id=course.id))
+    return course.id
+
+
+def update_course(session, course_id: int, changes: dict) -> bool:
+    """Apply the given COURSE_FIELDS to an active course. False if there is no such course."""
+    course = session.get(Course, course_id)
+    if course is None or course.retired:
+        return False
+    for field, value in changes.items():
+        if field == "college_name":
+            course.college_id = _college_id(session, value)
+        elif field == "stream_eligibility":
+            _set_streams(session, course_id, value)
+        else:
+            setattr(course, field, value)
+    course.updated_at = datetime.datetime.utcnow()  # Also when only the streams changed
+    session.add(KBChange(course_id=course_id))
+    return True
+
+
+def retire_course(session, course_id: int) -> bool:
+    """Take a course out of the catalogue (the row is kept). False if it is not active."""
+    result = session.execute(
+        update(Course).where(Course.id == course_id, Course.retired.is_(False)).values(retired=True, updated_at=datetime.datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        return False
+    session.add(KBChange(course_id=course_id))
+    return True
+
+
+def replace_catalogue(session, items: list) -> int:
+    """Replace the whole catalogue with validated KB records (JSON import); returns the course count.
+
+    The current courses are retired and the records inserted as new courses, so ids are
+    assigned by the database and never reused (KB order stays file order). Colleges are
+    matched by name; a college's address and contact come from its first record.
+    """
+    session.execute(
+        update(Course).where(Course.retired.is_(False)).values(retired=True, updated_at=datetime.datetime.utcnow())
+    )
+
+    colleges = {}
+    for item in items:
+        colleges.setdefault(item["college_name"], {"address": item.get("address"), "contact": item.get("contact")})
+    existing = dict(session.execute(select(College.name, College.id)).all())
+    college_ids = {name: existing[name] for name in colleges if name in existing}
+    if college_ids:
+        session.execute(update(College), [{"id": college_ids[name], **colleges[name]} for name in college_ids])
+    new_names = [name for name in colleges if name not in college_ids]
+    if new_names:
+        rows = [{"name": name, **colleges[name]} for name in new_names]
+        new_ids = session.scalars(insert(College).returning(College.id, sort_by_parameter_order=True), rows).all()
+        college_ids.update(zip(new_names, new_ids))
+
+    course_rows = [{
+        "college_id": college_ids[item["college_name"]], "course_name": item["course_name"],
+        "fees": item["fees"], "minimum_marks": item.get("minimum_marks"),
+        "qualification_required": item.get("qualification_required"), "retired": False,
+    } for item in items]
+    course_ids = []
+    if course_rows:
+        course_ids = session.scalars(insert(Course).returning(Course.id, sort_by_parameter_order=True), course_rows).all()
+    stream_rows = [
+        {"course_id": course_id, "position": position, "stream": stream}
+        for course_id, item in zip(course_ids, items)
+        for position, stream in enumerate(item.get("stream_eligibility", []))
+    ]
+    if stream_rows:
+        session.execute(insert(CourseStream), stream_rows)
+    session.add(KBChange(course_id=None))
+    return len(course_rows)
+
+
+if __name__ == "__main__":
+    # python kb_store.py import [knowledge_base.json]   (replaces the catalogue)
+    # python kb_store.py export [knowledge_base.json]
+    from database import SessionLocal
+    from kb_manager import validate_kb
+    from migrations import migrate
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export"):
+        sys.exit("usage: python kb_store.py import|export [path]")
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json")
+    migrate()
+    with SessionLocal() as session:
+        if sys.argv[1] == "import":
+            with open(path, "r") as f:
+                count = replace_catalogue(session, validate_kb(json.load(f)))
+            session.commit()
+            print(f"Imported {count} courses from {path}")
+        else:
+            items = export_items(session)
+            with open(path, "w") as f:
+                json.dump(items, f, indent=4)
+            print(f"Exported {len(items)} courses to {path}")
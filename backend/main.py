@@ -1,27 +1,80 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, Query, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from pydantic import BaseModel, Field, ValidationError
+from contextlib import asynccontextmanager, nullcontext
+import contextvars
+from typing import List, Optional
+from datetime import date, datetime as dt, time as dt_time, timedelta
+import csv
+import io
 import json
 import os
 from groq import AsyncGroq, AuthenticationError
 from dotenv import load_dotenv
 import asyncio
+import hmac
 import random
-
-from database import engine, Base, get_db
-from models import Application
-from sqlalchemy.orm import Session
+import time
+
+load_dotenv()  # Before the local imports below, they read their config at import time
+
+from database import SessionLocal, AsyncSessionLocal, async_engine, get_async_db
+from migrations import migrate
+from stats import increment_counters, read_stats
+from email_outbox import OutboxWorker
+from reference_ids import ReferenceAllocator
+import profiling
+from profiling import StageProfiler, stage, lap
+from metrics import (
+    REGISTRY, HTTP_REQUEST_SECONDS, GROQ_REQUEST_SECONDS, GROQ_TOKENS, AI_FALLBACKS,
+    ELIGIBLE_COURSES, DB_COMMIT_SECONDS,
+)
+from models import Application, EmailOutbox
+from rule_engine import build_student_flags, score_courses, apply_ai_boost, select_top, match_reason
+import vector_engine
+from kb_manager import KBManager, KBSnapshot, validate_kb
+import kb_store
+from career_cache import CareerCache, normalize_goal
+from singleflight import SingleFlight, fingerprint
+from result_cache import ResultCache, canonical_key
+from ai_gateway import OutboundManager, CircuitBreaker, CircuitOpenError, estimate_tokens
+from context_packer import pack_context
+from cohort import CohortPool
+from sqlalchemy import select, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
-Base.metadata.create_all(bind=engine)
+migrate()  # Creates tables and any indexes added since the DB was created
 
 load_dotenv() # Reloads env vars
 # Trigger reload for config update
 api_key = os.getenv("GROQ_API_KEY")
-client = AsyncGroq(api_key=api_key) if api_key else None
-
-app = FastAPI()
+# Retries are handled by the outbound manager below, not by the SDK
+client = AsyncGroq(
+    api_key=api_key,
+    base_url=os.getenv("GROQ_BASE_URL") or None,  # e.g. a local fake endpoint for testing
+    timeout=float(os.getenv("GROQ_TIMEOUT", "30")),
+    max_retries=0,
+) if api_key else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watcher = asyncio.create_task(kb_manager.watch()) if KB_WATCH_INTERVAL > 0 else None
+    mailer = asyncio.create_task(outbox_worker.run()) if EMAIL_WORKER else None
+    yield
+    if watcher:
+        watcher.cancel()
+    if mailer:
+        mailer.cancel()
+        await asyncio.gather(mailer, return_exceptions=True)
+        outbox_worker.close()
+    cohort_pool.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -30,25 +83,77 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-KB-Version", "X-Next-Cursor", "X-Suggestions-Partial"],
 )
 
 
 # Load Knowledge Base
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 KB_FILE = os.path.join(BASE_DIR, "knowledge_base.json")
-
-knowledge_base = []
+KB_BINARY_FILE = os.path.join(BASE_DIR, "knowledge_base.bin")  # Built with `python compact_kb.py`
+
+# KB representation: "json" (dicts, patched per changed course), "compact" (interned,
+# array-backed records) or "binary" (KB_BINARY_FILE memory-mapped read-only, pages
+# shared by all workers; not connected to the database catalogue)
+KB_FORMAT = os.getenv("KB_FORMAT", "json").lower()
+
+# Rule engine for /suggest-admission: "loop" (rule_engine.py) or "numpy" (vector_engine.py)
+RULE_ENGINE = os.getenv("RULE_ENGINE", "loop").lower()
+
+# Seconds between polls for catalogue changes made through other workers
+# (knowledge_base.bin on disk for KB_FORMAT=binary); 0 disables them
+KB_WATCH_INTERVAL = float(os.getenv("KB_WATCH_INTERVAL", "2"))
+
+# The catalogue lives in the database (kb_store.py); KB_FILE seeds an empty one
+kb_manager = KBManager(
+    SessionLocal,
+    KB_FILE,
+    rule_engine=RULE_ENGINE,
+    poll_interval=KB_WATCH_INTERVAL,
+    kb_format=KB_FORMAT,
+    binary_path=KB_BINARY_FILE,
+)
+career_cache = CareerCache(SessionLocal, max_entries=int(os.getenv("CAREER_CACHE_SIZE", "512")))
 
 def load_kb():
-    global knowledge_base
-    if os.path.exists(KB_FILE):
-        with open(KB_FILE, "r") as f:
-            knowledge_base = json.load(f)
-    else:
-        print(f"Warning: {KB_FILE} not found.")
+    kb_manager.load()
 
 load_kb()
 
+# Each request pins the snapshot that was live when it arrived, so a reload
+# mid-request never mixes two KB versions
+_request_kb = contextvars.ContextVar("request_kb", default=None)
+
+def current_kb() -> KBSnapshot:
+    return _request_kb.get() or kb_manager.snapshot
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template (e.g. /applications/reference/{reference_id}), never the raw path
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started, request.method, route.path if route else "unmatched", str(response.status_code)
+    )
+    return response
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def pin_kb_snapshot(request: Request, call_next):
+    kb = kb_manager.snapshot
+    token = _request_kb.set(kb)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_kb.reset(token)
+    response.headers["X-KB-Version"] = kb.version
+    return response
+
 # Models
 class StudentInput(BaseModel):
     name: str
@@ -72,11 +177,71 @@ class CourseSuggestion(BaseModel):
 
 
 
+groq_flight = SingleFlight()
+groq_outbound = OutboundManager(
+    max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", "8")),
+    requests_per_minute=int(os.getenv("GROQ_RPM", "30")),
+    tokens_per_minute=int(os.getenv("GROQ_TPM", "12000")),
+    max_retries=int(os.getenv("GROQ_MAX_RETRIES", "3")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("GROQ_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("GROQ_BREAKER_RESET", "30")),
+    ),
+)
+
+def record_groq_usage(caller: str, completion):
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        GROQ_TOKENS.inc(caller, "prompt", amount=usage.prompt_tokens or 0)
+        GROQ_TOKENS.inc(caller, "completion", amount=usage.completion_tokens or 0)
+
+def chunk_usage(chunk):
+    """Usage on a streamed chunk: Groq sends it in x_groq on the last chunk (usage with include_usage)."""
+    return getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+def record_stream_usage(caller: str, request: dict, usage, completion_chars: int):
+    """GROQ_TOKENS for a stream; estimated (about 4 characters per token) when it ended before the usage chunk."""
+    if usage is not None:
+        GROQ_TOKENS.inc(caller, "prompt", amount=usage.prompt_tokens or 0)
+        GROQ_TOKENS.inc(caller, "completion", amount=usage.completion_tokens or 0)
+        return
+    prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+    GROQ_TOKENS.inc(caller, "prompt", amount=prompt_chars // 4)
+    GROQ_TOKENS.inc(caller, "completion", amount=completion_chars // 4)
+
+async def create_completion(caller: str, **kwargs):
+    """Groq chat completion through the outbound manager (limits, retries, circuit breaker).
+
+    Identical concurrent requests share one upstream call. `caller` labels the metrics.
+    """
+    async def send():
+        completion = await groq_outbound.call(lambda: client.chat.completions.create(**kwargs), estimate_tokens(kwargs))
+        record_groq_usage(caller, completion)  # Only the call that really went upstream
+        return completion
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        completion = await groq_flight.do(fingerprint(kwargs), send)
+        outcome = "ok"
+        return completion
+    except CircuitOpenError:
+        outcome = "circuit_open"
+        raise
+    finally:
+        GROQ_REQUEST_SECONDS.observe(time.perf_counter() - started, caller, outcome)
+
 async def get_ai_analysis(student: StudentInput, course_name: str, college_name: str, use_real_ai: bool = True):
     """Get AI analysis for a specific course suggestion. Falls back to templates if rate limited or lower priority."""
     
-    # Identify strong subjects
-    strong_subjects = [sub for sub, mark in student.subject_marks.items() if float(mark) >= 75]
+    # Identify strong subjects (invalid marks are skipped, as in rule_engine.has_subject)
+    strong_subjects = []
+    for sub, mark in student.subject_marks.items():
+        try:
+            if float(mark) >= 75:
+                strong_subjects.append(sub)
+        except (ValueError, TypeError):
+            continue
     strong_subjects_str = ", ".join(strong_subjects) if strong_subjects else "your academic profile"
 
     # Fallback Template Generator
@@ -98,11 +263,14 @@ async def get_ai_analysis(student: StudentInput, course_name: str, college_name:
 
         return random.choice(templates)
 
-    if not use_real_ai or not os.getenv("GROQ_API_KEY"):
+    if not use_real_ai or not os.getenv("GROQ_API_KEY") or not groq_outbound.available():
+        reason = "not_requested" if not use_real_ai else "no_api_key" if not os.getenv("GROQ_API_KEY") else "circuit_open"
+        AI_FALLBACKS.inc("analysis_template", reason)
         return generate_smart_template()
     
     try:
-        completion = await client.chat.completions.create(
+        completion = await create_completion(
+            "get_ai_analysis",
             model="llama-3.3-70b-versatile",
             messages=[
                 {
@@ -134,18 +302,33 @@ async def get_ai_analysis(student: StudentInput, course_name: str, college_name:
         return completion.choices[0].message.content.strip()
     except Exception as e:
         print(f"AI API Error (falling back to template): {str(e)}")
+        AI_FALLBACKS.inc("analysis_template", "error")
         return generate_smart_template()
 
-async def analyze_career_goal(career_goal: str, kb: list) -> list:
-    """Ask AI to map a career goal to relevant course names from the KB."""
+async def analyze_career_goal(career_goal: str, kb: KBSnapshot) -> list:
+    """Map a career goal to relevant KB course names, using the career cache before asking the AI."""
     if not career_goal or not os.getenv("GROQ_API_KEY"):
         return []
 
-    # Extract all unique course names
-    all_courses = list(set([item["course_name"] for item in kb]))
-    
+    goal_key = normalize_goal(career_goal)
+    kb_hash = kb.career_courses_hash
+    cached = career_cache.get(goal_key, kb_hash)
+    if cached is None:
+        cached = await asyncio.to_thread(career_cache.get_persisted, goal_key, kb_hash)
+    if cached is not None:
+        return cached
+
+    suggested_courses = await ask_career_ai(career_goal, kb.career_course_names)
+    if suggested_courses is None:
+        return [] # Errors are not cached
+    await asyncio.to_thread(career_cache.put, goal_key, kb_hash, suggested_courses)
+    return suggested_courses
+
+async def ask_career_ai(career_goal: str, all_courses: list):
+    """Ask AI to map a career goal to relevant course names. Returns None on API/parse errors."""
     try:
-        completion = await client.chat.completions.create(
+        completion = await create_completion(
+            "analyze_career_goal",
             model="llama-3.3-70b-versatile",
             messages=[
                 {
@@ -184,394 +367,530 @@ async def analyze_career_goal(career_goal: str, kb: list) -> list:
         
     except Exception as e:
         print(f"Career AI Analysis Error: {e}")
-        return []
-
-@app.post("/suggest-admission", response_model=List[CourseSuggestion])
-async def suggest_admission(student: StudentInput):
-    suggestions = []
-    
-    # helper to check if student has a specific subject with passing marks
-    def has_subject(sub_name, min_mark=35):
-        for key, mark in student.subject_marks.items():
-            if sub_name.lower() in key.lower():
-                try:
-                    if float(mark) >= min_mark:
-                        return True
-                except (ValueError, TypeError):
-                    continue # Skip invalid marks
+        return None
+
+@app.get("/career-cache/stats")
+def career_cache_stats():
+    """Hit/miss counters for the analyze_career_goal cache (this worker)."""
+    return career_cache.stats()
+
+@app.get("/ai-calls/stats")
+def ai_call_stats():
+    """Groq call counters for this worker: coalescing, retries and circuit breaker state."""
+    return {"coalescing": groq_flight.stats(), "outbound": groq_outbound.stats()}
+
+# Stage profiling (/suggest-admission, /ai-chat, /ai-chat/stream): admins send PROFILING_TOKEN
+# in the X-Debug-Profile header or the ?profile= query flag and get a Server-Timing header
+# plus a debug payload back (the streaming chat puts the payload in its "done" event).
+# PROFILE_SAMPLE_RATE additionally traces that fraction of all requests, silently.
+# Traces go to PROFILE_TRACE_FILE (collapsed stacks, for flamegraph.pl / speedscope).
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_TRACE_FILE = os.getenv("PROFILE_TRACE_FILE", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+def profiling_requested(*tokens) -> bool:
+    if not PROFILING_TOKEN:
         return False
+    return any(t and hmac.compare_digest(t.encode(), PROFILING_TOKEN.encode()) for t in tokens)
 
-    # AI Career Analysis (Pre-fetch)
-    ai_suggested_courses_lower = []
-    if student.career_interest:
-        print(f"Analyzing career: {student.career_interest}")
-        ai_suggested_courses_lower = await analyze_career_goal(student.career_interest, knowledge_base)
-        print(f"AI Suggested Courses: {ai_suggested_courses_lower}")
+def profile_sampled() -> bool:
+    return bool(PROFILE_TRACE_FILE) and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
 
-    for item in knowledge_base:
-        course_name = item["course_name"]
-        course_name_lower = course_name.lower()
-        
-        is_eligible = False
-        rejection_reason = ""
-        special_note = ""
-
-        # ==========================================
-        #  RULE 1: Qualification Based Filtering
-        # ==========================================
-        if student.qualification == "10th":
-            # 10th -> ONLY Diploma
-            if "diploma" in course_name_lower:
-                is_eligible = True
-                special_note = "3 Years Full Time"
-            else:
-                continue # Strictly no degrees for 10th
+async def finish_profile(profiler: StageProfiler):
+    profiler.finish()
+    if PROFILE_TRACE_FILE:
+        await asyncio.to_thread(profiling.write_trace, PROFILE_TRACE_FILE, profiler)
 
-        elif student.qualification == "12th":
-            # 12th -> Degrees OR Diploma (Lateral Entry)
-            if "diploma" in course_name_lower:
-                is_eligible = True
-                special_note = "Direct 2nd Year (Lateral Entry)"
-            else:
-                # ==========================================
-                #  RULE 2: Stream & Subject Eligibility (Indian Context)
-                # ==========================================
-                is_degree_eligible = False
-                
-                # A. ENGINEERING (B.E / B.Tech)
-                if any(x in course_name_lower for x in ["engineering", "b.e", "b.tech"]):
-                    # Commerce/Arts students -> NO Engineering
-                    if student.stream in ["Commerce", "Arts"]:
-                        rejection_reason = "Stream Mismatch"
-                    
-                    # Vocational -> Eligible (Generally)
-                    elif student.stream == "Vocational":
-                        is_degree_eligible = True
-
-                    # Science (Bio/Math/Computer)
-                    else:
-                        # Bio students -> Only Biomedical/Bio-related unless they have Math
-                        if student.stream == "Biology" and not has_subject("Math"):
-                            if "biomedical" in course_name_lower or "biotech" in course_name_lower:
-                                is_degree_eligible = True
-                            else:
-                                rejection_reason = "Requires Maths"
-                        
-                        # Math/Computer students -> All Engineering
-                        elif has_subject("Math") or has_subject("Physics"):
-                            is_degree_eligible = True
-                        
-                        # Check strict subject reqs for specific branches
-                        if "computer" in course_name_lower:
-                             # CSE requires Math or Computer Science
-                             # If stream is CS, we assume they have it.
-                             if student.stream == "Computer Science":
-                                 pass
-                             elif not (has_subject("Math") or has_subject("Computer")):
-                                 is_degree_eligible = False
-                                 rejection_reason = "CSE Requires Maths/Computer Sc."
-
-                # B. ARTS & SCIENCE (B.Sc, BCA, B.Com, B.A)
-                elif "b.sc" in course_name_lower:
-                    # B.Sc Computer/Data -> Needs Math or CS
-                    if "computer" in course_name_lower or "data" in course_name_lower:
-                        if (student.stream == "Computer Science") or has_subject("Math") or has_subject("Computer"):
-                            is_degree_eligible = True
-                    # B.Sc Bio/Micro -> Needs Biology
-                    elif "bio" in course_name_lower or "microbiology" in course_name_lower:
-                        if (student.stream == "Biology") or has_subject("Biology") or has_subject("Botany"):
-                            is_degree_eligible = True
-                    else:
-                        # General B.Sc -> Science Stream mostly
-                        if student.stream not in ["Commerce", "Arts"]:
-                            is_degree_eligible = True
-
-                elif "bca" in course_name_lower:
-                    # BCA -> Any stream, but Math/CS preferred. 
-                    is_degree_eligible = True
-                
-                elif "b.com" in course_name_lower or "bba" in course_name_lower:
-                    # FIX: allow Commerce stream explicitly
-                    if (student.stream == "Commerce") or has_subject("Commerce") or has_subject("Accountancy") or has_subject("Business"):
-                        is_degree_eligible = True
-                
-                elif "b.a" in course_name_lower or "arts" in course_name_lower:
-                    is_degree_eligible = True # Open to all
+def with_partial_header(headers: dict, partial: bool) -> dict:
+    if partial:
+        headers["X-Suggestions-Partial"] = "career-deadline"
+    return headers
 
-                # Fallback
-                elif student.stream in item.get("stream_eligibility", []):
-                    is_degree_eligible = True
-                
-                if is_degree_eligible:
-                    is_eligible = True
-                else:
-                    continue
+@app.post("/suggest-admission", response_model=List[CourseSuggestion])
+async def suggest_admission(
+    student: StudentInput,
+    response: Response,
+    x_debug_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None),
+):
+    """Ranked course suggestions. X-Suggestions-Partial is set when the AI career
+    mapping missed CAREER_AI_DEADLINE and the list is rule-only."""
+    debug = profiling_requested(x_debug_profile, profile)
+    if not debug and not profile_sampled():
+        suggestions, partial = await compute_suggestions(student)
+        with_partial_header(response.headers, partial)
+        return suggestions
+
+    profiler = StageProfiler("suggest_admission")
+    token = profiling.activate(profiler)
+    try:
+        suggestions, partial = await compute_suggestions(student)
+    finally:
+        profiling.deactivate(token)
+    await finish_profile(profiler)
+    if not debug:
+        with_partial_header(response.headers, partial)
+        return suggestions
+    return JSONResponse(
+        {"suggestions": jsonable_encoder(suggestions), "partial": partial, "profile": profiler.to_dict()},
+        headers=with_partial_header({"Server-Timing": profiler.server_timing()}, partial),
+    )
 
-        if not is_eligible:
-            continue
+# Result cache for compute_suggestions, keyed on the canonical profile + KB version;
+# entries are (suggestions, eligible count) so hits still feed ELIGIBLE_COURSES
+suggestion_cache = ResultCache(
+    int(os.getenv("SUGGESTION_CACHE_SIZE", "2048")),
+    float(os.getenv("SUGGESTION_CACHE_TTL", "600")),
+)
 
-        # ==========================================
-        #  RULE X: Medical (MBBS/BDS) - ENABLED
-        # ==========================================
-        # if any(x in course_name_lower for x in ["mbbs", "bds", "bachelor of medicine", "bachelor of dental"]):
-        #     continue
-
-        # ==========================================
-        #  RULE 3: Percentage Logic (Tiered)
-        # ==========================================
-        # Hard limits from chatflow.md
-        if student.marks < 35: continue # Fail
-        
-        # Engineering Degree Rules
-        if "engineering" in course_name_lower and "diploma" not in course_name_lower:
-            if student.marks < 60 and student.stream != "Vocational":
-                # < 60% -> Suggest Diploma instead of Degree
-                continue 
-            
-            # High Demand Branches (CSE/ECE/Data) need 70%+
-            if any(x in course_name_lower for x in ["cse", "computer science", "data", "electronics"]):
-                 if student.marks < 65: # Relaxed slightly from 70 to 65 for usability
-                     continue
-
-        # ==========================================
-        #  SCORING: Rules 4, 5, 6
-        # ==========================================
-        relevance_score = 50 # Base
-        match_reasons = []
-
-        # Qualification Match
-        if special_note:
-            match_reasons.append(f"**{special_note}**")
-
-        # 1. High Mark Boost (Rule 6: Top Colleges/Courses)
-        if student.marks >= 80:
-            relevance_score += 20
-            match_reasons.append("Excellent academic record.")
-        elif student.marks >= 70:
-            relevance_score += 10
-        
-        # 2. Subject Strength (Rule 4)
-        if "engineering" in course_name_lower:
-            if has_subject("Math", 80):
-                relevance_score += 15
-                match_reasons.append("Strong Maths score.")
-            if has_subject("Physics", 80):
-                relevance_score += 10
-        
-        if "bio" in course_name_lower and has_subject("Biology", 80):
-             relevance_score += 15
-             match_reasons.append("Strong Biology score.")
+@app.get("/suggestion-cache/stats")
+def suggestion_cache_stats():
+    """Hit/miss counters for the suggestion result cache (this worker)."""
+    return suggestion_cache.stats()
 
-        # 3. Career Interest Match (Rule 5)
-        if student.career_interest:
-            interest_lower = student.career_interest.lower()
-            if "computer" in interest_lower or "code" in interest_lower or "software" in interest_lower:
-                if "computer" in course_name_lower or "bca" in course_name_lower or "data" in course_name_lower:
-                    relevance_score += 25
-                    match_reasons.append("Matches your career goal.")
-            
-            elif "doctor" in interest_lower or "medical" in interest_lower:
-                 if "bio" in course_name_lower or "medical" in course_name_lower:
-                    relevance_score += 25
-                    relevance_score += 25
-                    match_reasons.append("Aligns with medical aspirations.")
-            
-            # AI Direct Match Boost
-            if course_name_lower in ai_suggested_courses_lower:
-                relevance_score += 40 # Huge boost for AI match
-                match_reasons.append("🤖 AI Recommended for your Career Goal")
-        
-        # 4. Diploma vs Degree Weighting (Rule 1 refinement)
-        if student.qualification == "12th":
-            if "diploma" in course_name_lower:
-                # Always show Diplomas as valid options (Lateral Entry)
-                # Boost if marks are low (Primary option)
-                if student.marks < 65:
-                    relevance_score += 25
-                    match_reasons.append("Recommended foundation course.")
-                else:
-                    # For high marks, we don't penalize, just provide a smaller boost compared to degrees
-                    relevance_score += 5 
-                    match_reasons.append("Direct 2nd Year Option.")
-            else:
-                # Degree Courses
-                if student.marks >= 70:
-                    relevance_score += 15 # Prioritize Degrees for good students
-        
-        # 5. Preferred Course Match (Rule 10)
-        if student.preferred_course:
-             if student.preferred_course.lower() in course_name_lower:
-                 relevance_score += 100 # Top Priority
-                 match_reasons.append("✨ Your Preferred Course")
+# The AI career mapping runs alongside the rules and its +40 boost is applied as a
+# final re-rank. If it hasn't arrived CAREER_AI_DEADLINE seconds into the request,
+# the rule-only list is returned and flagged partial; the lookup keeps running and
+# still fills the career cache for the next student. 0 waits as long as it takes.
+CAREER_AI_DEADLINE = float(os.getenv("CAREER_AI_DEADLINE", "3"))
 
-        if not match_reasons:
-             match_reasons.append("Eligible option.")
+async def timed_career_goal(career_goal: str, kb: KBSnapshot) -> list:
+    """analyze_career_goal, recorded as a concurrent "career" profiling span."""
+    started = time.perf_counter_ns()
+    try:
+        return await analyze_career_goal(career_goal, kb)
+    finally:
+        profiling.span("career", started)
+
+def log_late_career_goal(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Career AI Analysis Error (after deadline): {task.exception()}")
+
+def rule_candidates(kb: KBSnapshot, flags) -> list:
+    """Rule-only (no AI mapping) candidates with the snapshot's engine."""
+    if kb.arrays is not None:
+        return vector_engine.score_courses(kb.arrays, flags, [])
+    return score_courses(kb.features, kb.fees, flags, [])
+
+async def compute_suggestions(student: StudentInput) -> tuple:
+    """(suggestions, partial) for one student; partial means the AI career mapping missed the deadline."""
+    kb = current_kb()
+    started = time.monotonic()
+    with stage("flags"):
+        flags = build_student_flags(student)
+
+    # AI Career Analysis, overlapped with the rules
+    career_task = None
+    if student.career_interest:
+        print(f"Analyzing career: {student.career_interest}")
+        career_task = asyncio.ensure_future(timed_career_goal(student.career_interest, kb))
+        await asyncio.sleep(0)  # An in-memory career cache hit completes right here
 
-        final_reason = " ".join(match_reasons)
-        
+    ai_suggested_courses_lower = []
+    partial = False
+    candidates = None
+    if career_task is not None and not career_task.done():
+        # Rules in a worker thread so the career lookup makes progress meanwhile
+        with stage("rules"):
+            candidates = await asyncio.to_thread(rule_candidates, kb, flags)
+        timeout = max(0.0, CAREER_AI_DEADLINE - (time.monotonic() - started)) if CAREER_AI_DEADLINE > 0 else None
+        with stage("career_wait"):
+            done, _ = await asyncio.wait({career_task}, timeout=timeout)
+        if not done:
+            partial = True
+            career_task.add_done_callback(log_late_career_goal)
+            AI_FALLBACKS.inc("suggestions_rules_only", "deadline")
+            print(f"Career AI Analysis missed the {CAREER_AI_DEADLINE}s deadline, returning rule-only results")
+    if career_task is not None and not partial:
+        ai_suggested_courses_lower = career_task.result()
+        print(f"AI Suggested Courses: {ai_suggested_courses_lower}")
+
+    # Students with the same canonical profile get the same list (see result_cache.py)
+    cache_key = canonical_key(flags, ai_suggested_courses_lower)
+    cached = suggestion_cache.get(kb.version, cache_key)
+    if cached is not None:
+        suggestions, eligible = cached
+        ELIGIBLE_COURSES.observe(eligible)
+        profiling.count("cache_hit", 1)
+        return list(suggestions), partial
+
+    # Eligibility + scoring (RULES 1-6), AI boost re-rank, top-k by Relevance High -> Fees Low
+    if candidates is None:
+        with stage("rules"):
+            candidates = rule_candidates(kb, flags)
+    with stage("rank"):
+        candidates = apply_ai_boost(candidates, kb.features, flags, ai_suggested_courses_lower)
+        lap("ai_boost")
+        selected = select_top(candidates, kb.features, flags.qualification)
+
+    with stage("response"):
+        suggestions = build_suggestions(len(candidates), selected, kb, flags, ai_suggested_courses_lower)
+    profiling.count("courses_scanned", len(kb))
+    profiling.count("eligible", len(candidates))
+    profiling.count("returned", len(suggestions))
+    suggestion_cache.put(kb.version, cache_key, (tuple(suggestions), len(candidates)))
+    return suggestions, partial
+
+def build_suggestions(eligible: int, selected: list, kb: KBSnapshot, flags, ai_suggested_courses_lower: list) -> List[CourseSuggestion]:
+    """Turn the select_top() result into the API response; reasons are only built for these courses."""
+    ELIGIBLE_COURSES.observe(eligible)
+    suggestions = []
+    for neg_score, _, index in selected:
+        item = kb.items[index]
         suggestions.append(CourseSuggestion(
             college_name=item["college_name"],
             course_name=item["course_name"],
             fees=item["fees"],
             address=item.get("address", "Tiruchirappalli"),
             contact=item.get("contact", "N/A"),
-            match_reason=final_reason,
-            relevance_score=relevance_score,
-            ai_analysis="" 
+            match_reason=match_reason(kb.features[index], flags, ai_suggested_courses_lower),
+            relevance_score=-neg_score,
+            ai_analysis=""
         ))
-    
-    # Sort: Relevance High -> Fees Low
-    suggestions.sort(key=lambda x: (-x.relevance_score, x.fees))
-    
-    # Balancing Logic for 12th Grade: Top 60 (20 Engineering, 20 Arts/Science, 20 Diploma)
-    if student.qualification == "12th":
-        eng_list = []
-        arts_list = []
-        diploma_list = []
-        other_list = []
-        
-        for res in suggestions:
-            name_lower = res.course_name.lower()
-            if "diploma" in name_lower or "lateral" in res.match_reason.lower():
-                if len(diploma_list) < 20: diploma_list.append(res)
-            elif any(x in name_lower for x in ["b.e", "b.tech", "engineering", "archi"]):
-                if len(eng_list) < 20: eng_list.append(res)
-            elif any(x in name_lower for x in ["b.sc", "b.a", "b.com", "bba", "bca", "arts"]):
-                if len(arts_list) < 20: arts_list.append(res)
+    lap("build")
+    return suggestions
+
+# Streamed AI analysis: how many top results get real AI text, and how many Groq calls run at once
+AI_ANALYSIS_TOP_K = int(os.getenv("AI_ANALYSIS_TOP_K", "5"))
+AI_ANALYSIS_CONCURRENCY = int(os.getenv("AI_ANALYSIS_CONCURRENCY", "3"))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/suggest-admission/stream")
+async def suggest_admission_stream(student: StudentInput):
+    """Server-Sent Events version of /suggest-admission.
+
+    Sends the ranked list straight away ("suggestions" event), then one "analysis" event
+    per course as its ai_analysis text is ready, then "done". The top AI_ANALYSIS_TOP_K
+    courses get real AI text (bounded concurrency), the rest get templates. "done" carries
+    the partial flag (AI career mapping missed CAREER_AI_DEADLINE).
+    """
+    suggestions, partial = await compute_suggestions(student)
+    semaphore = asyncio.Semaphore(AI_ANALYSIS_CONCURRENCY)
+
+    async def analyse(index: int, suggestion: CourseSuggestion, use_real_ai: bool) -> str:
+        """The "analysis" event for one course; a failure only affects that course's event."""
+        try:
+            if use_real_ai:
+                async with semaphore:
+                    text = await get_ai_analysis(student, suggestion.course_name, suggestion.college_name, use_real_ai=True)
             else:
-                # Catch-all
-                if len(other_list) < 10: other_list.append(res)
-        
-        # Combine all buckets
-        final_suggestions = eng_list + arts_list + diploma_list + other_list
-        # Return all found (capped by the buckets themselves)
-        return final_suggestions
-        
-    return suggestions[:50]
+                text = await get_ai_analysis(student, suggestion.course_name, suggestion.college_name, use_real_ai=False)
+        except Exception as e:
+            print(f"Analysis failed for {suggestion.course_name} at {suggestion.college_name}: {e}")
+            return sse_event("analysis", {"index": index, "ai_analysis": None, "error": "Analysis unavailable"})
+        return sse_event("analysis", {"index": index, "ai_analysis": text})
+
+    async def stream_events():
+        yield sse_event("suggestions", [s.model_dump() for s in suggestions])
+
+        # Top-ranked first: their tasks are created first so they get the semaphore first
+        top = sorted(range(len(suggestions)), key=lambda i: -suggestions[i].relevance_score)[:AI_ANALYSIS_TOP_K]
+        tasks = [asyncio.ensure_future(analyse(i, suggestions[i], True)) for i in top]
+        try:
+            top_set = set(top)
+            for index, suggestion in enumerate(suggestions):
+                if index not in top_set:
+                    yield await analyse(index, suggestion, False)
+
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+            yield sse_event("done", {"count": len(suggestions), "partial": partial})
+        finally:
+            # Client disconnected: queued analyses never start, and in-flight ones are
+            # cancelled upstream unless another request shares the call (SingleFlight)
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_events(), media_type="text/event-stream",
+                             headers=with_partial_header({"Cache-Control": "no-cache"}, partial))
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "5000"))
+cohort_pool = CohortPool()
+
+@app.post("/suggest-admission/batch")
+async def suggest_admission_batch(request: Request):
+    """Suggestions for a whole cohort.
+
+    Accepts a JSON list of StudentInput profiles or an NDJSON upload (one profile per line)
+    and streams NDJSON back, one line per student as soon as its chunk has been ranked.
+    """
+    kb = current_kb()
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            raw_profiles = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raw_profiles = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    if not isinstance(raw_profiles, list):
+        raise HTTPException(status_code=400, detail="Expected a list of student profiles.")
+    if len(raw_profiles) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} students).")
+
+    # Validate each profile separately so one bad row doesn't reject the whole class
+    students = []  # (input index, StudentInput)
+    invalid = []   # (input index, error)
+    for index, raw in enumerate(raw_profiles):
+        try:
+            students.append((index, StudentInput.model_validate(raw)))
+        except ValidationError as e:
+            invalid.append((index, e.errors(include_url=False, include_context=False)))
+
+    # One AI career lookup per distinct goal, shared by every student with that goal
+    goals = {}
+    for _, student in students:
+        if student.career_interest:
+            goals.setdefault(normalize_goal(student.career_interest), student.career_interest)
+    goal_keys = list(goals)
+    goal_results = await asyncio.gather(*(analyze_career_goal(goals[key], kb) for key in goal_keys))
+    career_courses = dict(zip(goal_keys, goal_results))
+    print(f"Batch of {len(students)} students, {len(goal_keys)} distinct career goals")
+
+    jobs = [
+        (build_student_flags(student), career_courses.get(normalize_goal(student.career_interest), []))
+        for _, student in students
+    ]
+
+    async def stream_results():
+        for index, errors in invalid:
+            yield json.dumps({"index": index, "error": errors}) + "\n"
+        async for job_index, (eligible, selected) in cohort_pool.rank_many(kb, jobs):
+            index, student = students[job_index]
+            flags, ai_suggested_courses_lower = jobs[job_index]
+            suggestions = build_suggestions(eligible, selected, kb, flags, ai_suggested_courses_lower)
+            yield json.dumps({
+                "index": index,
+                "name": student.name,
+                "suggestions": [s.model_dump() for s in suggestions],
+            }) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 class ChatInput(BaseModel):
     message: str
 
-def retrieve_context(query: str, kb: list) -> list:
-    """Keyword-based retrieval with stop-word filtering to allow short acronyms (e.g. BCA, CSE)."""
-    
-    stop_words = {
-        "what", "which", "where", "when", "how", "who", "whom", "whose", "why",
-        "is", "are", "was", "were", "be", "been", "being",
-        "the", "a", "an", "and", "or", "but", "if", "then", "else", "when",
-        "at", "by", "for", "from", "in", "into", "of", "off", "on", "onto", "out", "over", "to", "up", "with",
-        "can", "could", "will", "would", "shall", "should", "may", "might", "must",
-        "tell", "me", "about", "give", "list", "show", "find", "best", "good", "top", "colleges", "college", "courses"
-    }
-
-    # Normalize and split tokens
-    raw_tokens = query.lower().replace("?", "").replace(".", " ").replace(",", " ").split()
-    
-    # Filter tokens: Keep if length >= 2 AND not in stop_words
-    # Exception: Keep 'ai' even though it's length 2, it's relevant (though maybe matched by other means)
-    tokens = [t for t in raw_tokens if len(t) >= 2 and t not in stop_words]
-    
-    # Debug: Print tokens (visible in server logs if needed)
-    print(f"Search tokens: {tokens}")
-
-    # If no specific keywords found (e.g. query was just stop words), provide a summary
-    if not tokens:
-        overview = []
-        seen = set()
-        for item in kb:
-            key = (item['college_name'], item['course_name'])
-            if key not in seen:
-                overview.append({"college": item['college_name'], "course": item['course_name']})
-                seen.add(key)
-        return overview[:30]
-
-    scored_items = []
-    for item in kb:
-        score = 0
-        # Create a searchable string from the item's relevant fields
-        # Weighting: Course name and College name are most important
-        item_str = (item["course_name"] + " " + item["college_name"] + " " + item.get("stream_eligibility", [""])[0]).lower()
-        
-        for token in tokens:
-            if token in item_str:
-                score += 1
+def retrieve_context(query: str, kb: KBSnapshot) -> list:
+    """Top-20 KB records for a chat message, ranked with the snapshot's BM25 index."""
+    with stage("retrieve"):
+        terms = kb.index.query_terms(query)
+        # Debug: Print tokens (visible in server logs if needed)
+        print(f"Search tokens: {list(terms)}")
+        return kb.index.search_terms(terms, limit=20)
+
+def keyword_only_reply(context_data: list) -> str:
+    """Answer from the retrieved records alone, used while the AI is unavailable."""
+    if not context_data:
+        return "I apologize, but I don't have information on that specific topic right now."
+    lines = ["My AI assistant is busy right now, but here is what I found for you:"]
+    for item in context_data[:10]:
+        if "course_name" in item:
+            lines.append(f"- **{item['course_name']}** at {item['college_name']} (Fees: ₹{item['fees']})")
+        else:
+            lines.append(f"- **{item['course']}** at {item['college']}")
+    return "\n".join(lines)
+
+NO_API_KEY_REPLY = "I'm sorry, my AI brain is currently disconnected (API key missing)."
+AUTH_ERROR_REPLY = "I'm sorry, but my connection to the AI brain is currently unauthorized (Invalid API Key). Please update the configuration."
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "800"))
+
+def chat_request(message: str, context_data: list) -> dict:
+    """Groq request parameters for an /ai-chat message (shared by the plain and streaming endpoints)."""
+    with stage("pack"):
+        context_text, stats = pack_context(message, context_data, CHAT_CONTEXT_TOKEN_BUDGET)
+    print(f"Chat context: {stats['packed_records']}/{stats['records']} records, ~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens")
+    return dict(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {
+                "role": "system",
+                "content": f"""You are a warm, professional, and encouraging student admission counselor.
                 
-                # Bonus score for exact Matches in the Course Name (e.g. "BCA" in "BCA (Bachelor...)")
-                # Add spaces to ensure we match whole words if possible, or just rely on substring
-                if token in item["course_name"].lower().split():
-                     score += 2 # Heavy weight for course name match
-        
-        if score > 0:
-            scored_items.append((score, item))
-            
-    # Sort by relevance (Score DESC)
-    scored_items.sort(key=lambda x: x[0], reverse=True)
-    
-    # Return top 20 most relevant items
-    return [item for score, item in scored_items[:20]]
+                Data Source:
+                <data>
+                {context_text}
+                </data>
+
+                Platform User Guide (How to use this App):
+                1. **Step 1: Fill Profile**: Enter your name, marks (10th/12th), stream (Science/Arts/etc.), and career goal (e.g., 'Doctor', 'Engineer') in the main form.
+                2. **Step 2: Get Suggestions**: Click 'Fetch Admission Matches'. Our AI analyzes your marks and career goal to find the best college & course matches.
+                3. **Step 3: AI Insights**: Review the results. We show 'Top Choices' and provide explanations for *why* a course fits you (e.g., "Strong Maths score").
+                4. **Step 4: Apply**: Click 'Apply Now' on your preferred college. Review your pre-filled application form and submit it. You will receive an email confirmation.
+
+                Guidelines:
+                1. **Tone**: Be sweet, polite, and professional. Use natural, conversational language (e.g., "I'd be happy to help!", "Here are some excellent options for you").
+                2. **Transparency**: NEVER say "Based on the provided data", "According to my database", or "The colleges in our data". Speak as if you know this information personally.
+                3. **Accuracy**: strictly answer using ONLY the provided data. Do not invent facts.
+                4. **Missing Info**: If the info is missing, politely say, "I apologize, but I don't have information on that specific topic right now."
+                5. **Formatting**: When listing colleges or courses, YOU MUST use a clean bullet-point format. 
+                6. **Readability**: Keep general answers concise (2-4 sentences). Ensure the output is professional, clear, and easy to read.
+                """
+            },
+            {
+                "role": "user",
+                "content": message
+            }
+        ],
+        temperature=0.7,
+        max_tokens=300,
+        top_p=1,
+        stop=None,
+    )
 
-@app.post("/ai-chat")
-async def ai_chat(chat: ChatInput):
-    """Handle interactive AI chat for admission guidance."""
+async def chat_reply(message: str) -> str:
+    """Reply text for an /ai-chat message."""
     if not os.getenv("GROQ_API_KEY"):
-        return {"reply": "I'm sorry, my AI brain is currently disconnected (API key missing)."}
+        return NO_API_KEY_REPLY
     
     # Filter knowledge base to find relevant info
-    context_data = retrieve_context(chat.message, knowledge_base)
+    context_data = retrieve_context(message, current_kb())
+
+    if not groq_outbound.available():
+        AI_FALLBACKS.inc("chat_keyword_only", "circuit_open")
+        return keyword_only_reply(context_data)
 
     try:
-        completion = await client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are a warm, professional, and encouraging student admission counselor.
-                    
-                    Data Source:
-                    <data>
-                    {json.dumps(context_data)}
-                    </data>
-
-                    Platform User Guide (How to use this App):
-                    1. **Step 1: Fill Profile**: Enter your name, marks (10th/12th), stream (Science/Arts/etc.), and career goal (e.g., 'Doctor', 'Engineer') in the main form.
-                    2. **Step 2: Get Suggestions**: Click 'Fetch Admission Matches'. Our AI analyzes your marks and career goal to find the best college & course matches.
-                    3. **Step 3: AI Insights**: Review the results. We show 'Top Choices' and provide explanations for *why* a course fits you (e.g., "Strong Maths score").
-                    4. **Step 4: Apply**: Click 'Apply Now' on your preferred college. Review your pre-filled application form and submit it. You will receive an email confirmation.
-
-                    Guidelines:
-                    1. **Tone**: Be sweet, polite, and professional. Use natural, conversational language (e.g., "I'd be happy to help!", "Here are some excellent options for you").
-                    2. **Transparency**: NEVER say "Based on the provided data", "According to my database", or "The colleges in our data". Speak as if you know this information personally.
-                    3. **Accuracy**: strictly answer using ONLY the provided data. Do not invent facts.
-                    4. **Missing Info**: If the info is missing, politely say, "I apologize, but I don't have information on that specific topic right now."
-                    5. **Formatting**: When listing colleges or courses, YOU MUST use a clean bullet-point format. 
-                    6. **Readability**: Keep general answers concise (2-4 sentences). Ensure the output is professional, clear, and easy to read.
-                    """
-                },
-                {
-                    "role": "user",
-                    "content": chat.message
-                }
-            ],
-            temperature=0.7,
-            max_tokens=300,
-            top_p=1,
-            stream=False,
-            stop=None,
-        )
-        return {"reply": completion.choices[0].message.content.strip()}
+        request = chat_request(message, context_data)
+        with stage("groq"):
+            completion = await create_completion("ai_chat", **request, stream=False)
+        return completion.choices[0].message.content.strip()
     except AuthenticationError:
-        return {"reply": "I'm sorry, but my connection to the AI brain is currently unauthorized (Invalid API Key). Please update the configuration."}
+        return AUTH_ERROR_REPLY
+    except CircuitOpenError:
+        AI_FALLBACKS.inc("chat_keyword_only", "circuit_open")
+        return keyword_only_reply(context_data)
     except Exception as e:
-        return {"reply": f"Error: {str(e)}"}
+        return f"Error: {str(e)}"
+
+@app.post("/ai-chat")
+async def ai_chat(
+    chat: ChatInput,
+    x_debug_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None),
+):
+    """Handle interactive AI chat for admission guidance."""
+    debug = profiling_requested(x_debug_profile, profile)
+    if not debug and not profile_sampled():
+        return {"reply": await chat_reply(chat.message)}
+
+    profiler = StageProfiler("ai_chat")
+    token = profiling.activate(profiler)
+    try:
+        reply = await chat_reply(chat.message)
+    finally:
+        profiling.deactivate(token)
+    await finish_profile(profiler)
+    if not debug:
+        return {"reply": reply}
+    return JSONResponse({"reply": reply, "profile": profiler.to_dict()},
+                        headers={"Server-Timing": profiler.server_timing()})
+
+@app.post("/ai-chat/stream")
+async def ai_chat_stream(
+    chat: ChatInput,
+    x_debug_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None),
+):
+    """Streaming /ai-chat over Server-Sent Events.
+
+    Sends a "token" event for every chunk as Groq produces it and "done" at the end.
+    Problems arrive in-stream as an "error" event with the same reply text /ai-chat uses.
+    When profiling is requested "done" also carries the stage profile (headers are
+    already sent by then, so there is no Server-Timing header).
+    """
+    debug = profiling_requested(x_debug_profile, profile)
+    profiler = StageProfiler("ai_chat_stream") if debug or profile_sampled() else None
+
+    async def done_event() -> str:
+        if profiler is None:
+            return sse_event("done", {})
+        await finish_profile(profiler)
+        return sse_event("done", {"profile": profiler.to_dict()} if debug else {})
+
+    async def stream_events():
+        if not os.getenv("GROQ_API_KEY"):
+            yield sse_event("error", {"reply": NO_API_KEY_REPLY})
+            return
+
+        # Bound only around code without yields: the generator may be closed from another context
+        token = profiling.activate(profiler)
+        try:
+            context_data = retrieve_context(chat.message, current_kb())
+            request = chat_request(chat.message, context_data) if groq_outbound.available() else None
+        finally:
+            profiling.deactivate(token)
+        if request is None:
+            AI_FALLBACKS.inc("chat_keyword_only", "circuit_open")
+            yield sse_event("token", {"text": keyword_only_reply(context_data)})
+            yield await done_event()
+            return
+
+        stream = None
+        usage = None
+        completion_chars = 0
+        started = time.perf_counter()
+        try:
+            with profiler.stage("groq") if profiler is not None else nullcontext():  # Until the last token
+                # Streams can't be shared, so this skips the coalescing in create_completion
+                stream = await groq_outbound.call(
+                    lambda: client.chat.completions.create(**request, stream=True), estimate_tokens(request)
+                )
+                GROQ_REQUEST_SECONDS.observe(time.perf_counter() - started, "ai_chat_stream", "ok")  # Time to stream open
+                async for chunk in stream:
+                    usage = chunk_usage(chunk) or usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        completion_chars += len(chunk.choices[0].delta.content)
+                        yield sse_event("token", {"text": chunk.choices[0].delta.content})
+            yield await done_event()
+        except AuthenticationError:
+            yield sse_event("error", {"reply": AUTH_ERROR_REPLY})
+        except CircuitOpenError:
+            AI_FALLBACKS.inc("chat_keyword_only", "circuit_open")
+            yield sse_event("token", {"text": keyword_only_reply(context_data)})
+            yield await done_event()
+        except Exception as e:
+            yield sse_event("error", {"reply": f"Error: {str(e)}"})
+        finally:
+            # Also runs when the client disconnects, closing the upstream Groq response
+            if stream is not None:
+                record_stream_usage("ai_chat_stream", request, usage, completion_chars)
+                await stream.close()
+
+    return StreamingResponse(stream_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/")
 def read_root():
     return {"message": "Student Admission Suggester API is running. POST to /suggest-admission to get results."}
 
 # Email & Application Logic
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+# Confirmation emails go through the outbox table; the worker keeps one SMTP
+# connection open and retries failures, so submits never wait on SMTP.
+outbox_worker = OutboxWorker(
+    AsyncSessionLocal,
+    smtp_host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+    smtp_port=int(os.getenv("SMTP_PORT", "587")),
+    smtp_user=os.getenv("SMTP_USER", ""),
+    smtp_password=os.getenv("SMTP_PASSWORD", ""),
+    starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", "20")),
+    poll_interval=float(os.getenv("EMAIL_POLL_INTERVAL", "2")),
+    max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "6")),
+    retry_base=float(os.getenv("EMAIL_RETRY_BASE", "30")),
+    retry_max=float(os.getenv("EMAIL_RETRY_MAX", "3600")),
+    spool_dir=os.getenv("EMAIL_SPOOL_DIR", os.path.join(BASE_DIR, "email_spool")),
+    spool_max_bytes=int(os.getenv("EMAIL_SPOOL_MAX_BYTES", "5000000")),
+    spool_backups=int(os.getenv("EMAIL_SPOOL_BACKUPS", "5")),
+)
+EMAIL_WORKER = os.getenv("EMAIL_WORKER", "true").lower() == "true"  # false: this process only enqueues
+
+
+@app.get("/email-outbox/stats")
+async def email_outbox_stats():
+    return await outbox_worker.stats()
 
 class ApplicationInput(BaseModel):
     college: str
@@ -594,76 +913,28 @@ class ApplicationInput(BaseModel):
 # In-memory storage for applications
 applications_db = []
 
-@app.post("/submit-application")
-async def submit_application(application: ApplicationInput, db: Session = Depends(get_db)):
-    # 1. Duplicate Check
-    existing_app = db.query(Application).filter(
-        Application.college == application.college,
-        (Application.email == application.email) | (Application.phone == application.phone)
-    ).first()
-
-    if existing_app:
-        raise HTTPException(status_code=400, detail="Application already submitted for this college with this Email or Phone.")
-
-    # 2. Generate Reference ID
-    # Abbreviation: First letter of each word in uppercase
-    import datetime
-    current_year = datetime.datetime.now().year
-    
-    # Simple abbreviation logic
-    ignore_words = ["of", "and", "the", "in", "for"]
-    college_abbr = "".join([word[0].upper() for word in application.college.split() if word.lower() not in ignore_words and word.isalnum()])
-    
-    # Ensure at least 2 chars
-    if len(college_abbr) < 2:
-        college_abbr = application.college[:3].upper()
-        
-    random_digits = random.randint(10000, 99999)
-    ref_id = f"{college_abbr}{current_year}{random_digits}"
-    
-    # 3. Save application (SQLite Persistence)
-    try:
-        marks_percentage = float(application.marksPercentage) if application.marksPercentage != "N/A" else 0.0
-    except ValueError:
-        marks_percentage = 0.0
-
-    new_app = Application(
-        college=application.college,
-        studentName=application.studentName,
-        parentName=application.parentName,
-        email=application.email,
-        phone=application.phone,
-        gender=application.gender,
-        dob=application.dob,
-        community=application.community,
-        address=application.address,
-        qualification=application.qualification,
-        stream=application.stream,
-        marksPercentage=marks_percentage,
-        courseApplied=application.courseApplied,
-        message=application.message,
-        reference_id=ref_id
-    )
-    db.add(new_app)
-    db.commit()
-    db.refresh(new_app)
-
-    print(f"Received Application for {application.college} from {application.studentName} ({application.email}) - Ref: {ref_id}")
-
-    # 4. Configure SMTP (Get from ENV)
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
+DUPLICATE_APPLICATION = "Application already submitted for this college with this Email or Phone."
 
-    # Response message
-    response_msg = "Application submitted successfully!"
+reference_allocator = ReferenceAllocator(AsyncSessionLocal, block_size=int(os.getenv("REFERENCE_BLOCK_SIZE", "20")))
 
-    # Create Email (HTML)
-    msg = MIMEMultipart('alternative')
-    msg['From'] = smtp_user if smtp_user else "admission@college.edu"
-    msg['To'] = application.email
-    msg['Subject'] = f"✅ Admission Received: {application.courseApplied} @ {application.college}"
+@app.post("/submit-application")
+async def submit_application(application: ApplicationInput, db: AsyncSession = Depends(get_async_db)):
+    # 1. Duplicate Check before a reference number is taken, so rejected resubmits
+    # leave no gaps (the unique indexes below still catch concurrent duplicates)
+    duplicate = (await db.execute(
+        select(Application.id).where(
+            Application.college == application.college,
+            or_(Application.email == application.email, Application.phone == application.phone),
+        ).limit(1)
+    )).first()
+    if duplicate is not None:
+        raise HTTPException(status_code=400, detail=DUPLICATE_APPLICATION)
+
+    # 2. Generate Reference ID (college abbreviation + year + per-college sequence)
+    ref_id = await reference_allocator.allocate(application.college)
+    
+    # 3. Confirmation email, queued in the outbox and sent by outbox_worker
+    subject = f"✅ Admission Received: {application.courseApplied} @ {application.college}"
 
     # Plain Text Fallback
     text_body = f"""
@@ -743,38 +1014,49 @@ async def submit_application(application: ApplicationInput, db: Session = Depend
     </html>
     """
 
-    msg.attach(MIMEText(text_body, 'plain'))
-    msg.attach(MIMEText(html_body, 'html'))
-
-    # CHECK: IF Credentials are missing, Save to File instead of Crashing/Erroring
-    if not smtp_user or not smtp_password:
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"email_simulation_{timestamp}.html"
-        file_path = os.path.join(BASE_DIR, filename)
-        
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(html_body)
-            
-        print(f"Simulated Email Saved to: {file_path}")
-        return {"message": f"Application submitted! (Email simulated)", "reference_id": ref_id}
-
+    # 4. Save application and its confirmation email (one transaction)
     try:
-        # Send Real Email (Sync operation in thread)
-        def send_email_sync():
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_user, smtp_password.replace(" ", ""))
-                server.send_message(msg)
+        marks_percentage = float(application.marksPercentage) if application.marksPercentage != "N/A" else 0.0
+    except ValueError:
+        marks_percentage = 0.0
 
-        await asyncio.to_thread(send_email_sync)
-        response_msg += " Confirmation email sent successfully."
+    new_app = Application(
+        college=application.college,
+        studentName=application.studentName,
+        parentName=application.parentName,
+        email=application.email,
+        phone=application.phone,
+        gender=application.gender,
+        dob=application.dob,
+        community=application.community,
+        address=application.address,
+        qualification=application.qualification,
+        stream=application.stream,
+        marksPercentage=marks_percentage,
+        courseApplied=application.courseApplied,
+        message=application.message,
+        reference_id=ref_id
+    )
+    db.add(new_app)
+    db.add(EmailOutbox(to_address=application.email, subject=subject, text_body=text_body, html_body=html_body))
+    try:
+        await db.flush()  # Duplicate rows fail here, before any counter is touched
+        await increment_counters(db, new_app)  # Same transaction as the insert
+        started = time.perf_counter()
+        await db.commit()
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started, "submit_application")
+    except IntegrityError:
+        # The unique (college, email) / (college, phone) indexes reject the row, so two
+        # concurrent submits can never both be saved; only this race skips a number
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=DUPLICATE_APPLICATION)
 
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        response_msg += f" (Note: Email sending failed: {str(e)})"
+    print(f"Received Application for {application.college} from {application.studentName} ({application.email}) - Ref: {ref_id}")
+    outbox_worker.notify()
 
-    return {"message": response_msg, "reference_id": ref_id}
+    if outbox_worker.simulated:
+        return {"message": f"Application submitted! (Email simulated)", "reference_id": ref_id}
+    return {"message": "Application submitted successfully! A confirmation email will be sent shortly.", "reference_id": ref_id}
 
 # Dashboard Authentication Logic
 class LoginRequest(BaseModel):
@@ -789,11 +1071,248 @@ async def login(req: LoginRequest):
     
     raise HTTPException(status_code=401, detail="Invalid username or password")
 
+@app.get("/applications/reference/{reference_id}")
+async def get_application_by_reference(reference_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Single application by reference ID (unique index lookup)."""
+    application = (await db.execute(
+        select(Application).where(Application.reference_id == reference_id.strip().upper())
+    )).scalar_one_or_none()
+    if application is None:
+        raise HTTPException(status_code=404, detail="No application with this reference ID")
+    return application
+
+
+@app.get("/reference-ids/stats")
+async def reference_id_stats():
+    return reference_allocator.stats()
+
+
+@app.get("/applications/stats")
+async def get_application_stats(db: AsyncSession = Depends(get_async_db)):
+    """Application counts per college, courseApplied, stream and community, plus the total."""
+    return await read_stats(db)
+
+
+# Dashboard listing: keyset pages on id, so page N costs the same as page 1
+APPLICATIONS_PAGE_SIZE = int(os.getenv("APPLICATIONS_PAGE_SIZE", "100"))
+APPLICATIONS_MAX_PAGE_SIZE = int(os.getenv("APPLICATIONS_MAX_PAGE_SIZE", "1000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+APPLICATION_FIELDS = [column.name for column in Application.__table__.columns]
+
+
+class ApplicationQuery:
+    """Filters and projection shared by /applications and /applications/export."""
+
+    def __init__(
+        self,
+        college: Optional[str] = None,
+        courseApplied: Optional[str] = None,
+        stream: Optional[str] = None,
+        qualification: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,  # Inclusive
+        fields: Optional[str] = Query(None, description="Comma separated columns, e.g. studentName,email"),
+    ):
+        self.fields = APPLICATION_FIELDS
+        if fields:
+            self.fields = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in self.fields if f not in APPLICATION_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+            if "id" not in self.fields:
+                self.fields.insert(0, "id")  # Needed for the cursor
+
+        self.conditions = []
+        for column, value in (
+            (Application.college, college),
+            (Application.courseApplied, courseApplied),
+            (Application.stream, stream),
+            (Application.qualification, qualification),
+        ):
+            if value is not None:
+                self.conditions.append(column == value)
+        if date_from is not None:
+            self.conditions.append(Application.created_at >= dt.combine(date_from, dt_time.min))
+        if date_to is not None:
+            self.conditions.append(Application.created_at < dt.combine(date_to + timedelta(days=1), dt_time.min))
+
+    def page(self, after_id: int, limit: int):
+        columns = [Application.__table__.c[f] for f in self.fields]
+        return (
+            select(*columns)
+            .where(Application.id > after_id, *self.conditions)
+            .order_by(Application.id)
+            .limit(limit)
+        )
+
+
 @app.get("/applications")
-async def get_applications(db: Session = Depends(get_db)):
-    """Fetch all applications for dashboard view."""
-    applications = db.query(Application).all()
-    return applications
+async def get_applications(
+    response: Response,
+    after_id: int = 0,
+    limit: int = Query(APPLICATIONS_PAGE_SIZE, ge=1, le=APPLICATIONS_MAX_PAGE_SIZE),
+    query: ApplicationQuery = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """One page of applications for the dashboard, oldest first.
+    Pass the X-Next-Cursor response header back as after_id for the next page (absent on the last page)."""
+    rows = (await db.execute(query.page(after_id, limit))).mappings().all()
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return [dict(row) for row in rows]
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, dt) else value
+
+
+@app.get("/applications/export")
+async def export_applications(format: str = "csv", query: ApplicationQuery = Depends()):
+    """Bulk download (CSV for spreadsheets, or NDJSON), streamed EXPORT_CHUNK_SIZE rows at a time."""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    async def rows_in_chunks():
+        id_at = query.fields.index("id")
+        after_id = 0
+        while True:
+            # A short read per chunk: no long-lived transaction holding back WAL checkpoints
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(query.page(after_id, EXPORT_CHUNK_SIZE))).all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+            after_id = rows[-1][id_at]
+
+    async def csv_stream():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(query.fields)
+        async for rows in rows_in_chunks():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # Header only (no matching rows)
+
+    async def ndjson_stream():
+        async for rows in rows_in_chunks():
+            yield "".join(
+                json.dumps({f: _export_value(v) for f, v in zip(query.fields, row)}) + "\n"
+                for row in rows
+            )
+
+    if format == "csv":
+        return StreamingResponse(
+            csv_stream(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=applications.csv"},
+        )
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+# Knowledge base admin API. Writes go to the catalogue tables and are applied to
+# this worker's snapshot straight away, other workers pick them up within
+# KB_WATCH_INTERVAL; only the changed courses are re-indexed. Callers send
+# KB_ADMIN_TOKEN in the X-Admin-Token header (empty token disables the API).
+KB_ADMIN_TOKEN = os.getenv("KB_ADMIN_TOKEN", "")
+
+def require_kb_admin(x_admin_token: Optional[str] = Header(None)):
+    if not KB_ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), KB_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Knowledge base admin token required.")
+
+class CourseIn(BaseModel):
+    college_name: str
+    course_name: str
+    fees: int = Field(..., ge=0)
+    minimum_marks: Optional[float] = Field(None, ge=0, le=100)
+    qualification_required: Optional[str] = None  # "10th" or "12th"
+    stream_eligibility: List[str] = []
+    address: Optional[str] = None  # Only used when the college is new
+    contact: Optional[str] = None
+
+class CourseUpdate(BaseModel):
+    college_name: Optional[str] = None
+    course_name: Optional[str] = None
+    fees: Optional[int] = Field(None, ge=0)
+    minimum_marks: Optional[float] = Field(None, ge=0, le=100)
+    qualification_required: Optional[str] = None
+    stream_eligibility: Optional[List[str]] = None
+
+class FeesUpdate(BaseModel):
+    fees: int = Field(..., ge=0)
+
+async def write_kb(db: AsyncSession, write, *args):
+    """Run a kb_store write in one transaction, then publish it to this worker's snapshot."""
+    if not kb_manager.database_backed:
+        raise HTTPException(status_code=409, detail="KB_FORMAT=binary serves knowledge_base.bin read-only.")
+    result = await db.run_sync(write, *args)
+    if result is False:
+        raise HTTPException(status_code=404, detail="No active course with this id")
+    started = time.perf_counter()
+    await db.commit()
+    DB_COMMIT_SECONDS.observe(time.perf_counter() - started, "kb_admin")
+    await kb_manager.sync()
+    return result
+
+@app.get("/admin/courses", dependencies=[Depends(require_kb_admin)])
+async def list_courses(college: Optional[str] = None):
+    """Courses in the live snapshot with their ids, optionally for one college."""
+    kb = current_kb()
+    if kb.course_ids is None:
+        return []
+    return [
+        {"id": course_id, **item}
+        for course_id, item in zip(kb.course_ids, kb.items)
+        if college is None or item["college_name"] == college
+    ]
+
+@app.post("/admin/courses", status_code=201, dependencies=[Depends(require_kb_admin)])
+async def add_course(course: CourseIn, db: AsyncSession = Depends(get_async_db)):
+    course_id = await write_kb(db, kb_store.add_course, course.model_dump(exclude_none=True))
+    return {"id": course_id, "kb_version": kb_manager.snapshot.version}
+
+@app.patch("/admin/courses/{course_id}", dependencies=[Depends(require_kb_admin)])
+async def update_course(course_id: int, update: CourseUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Change some fields of a course; only the fields sent are touched (minimum_marks may be null)."""
+    changes = update.model_dump(exclude_unset=True)
+    for field in ("college_name", "course_name", "fees", "stream_eligibility"):
+        if field in changes and changes[field] is None:
+            raise HTTPException(status_code=400, detail=f"{field} cannot be null")
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    await write_kb(db, kb_store.update_course, course_id, changes)
+    return {"id": course_id, "kb_version": kb_manager.snapshot.version}
+
+@app.put("/admin/courses/{course_id}/fees", dependencies=[Depends(require_kb_admin)])
+async def update_course_fees(course_id: int, update: FeesUpdate, db: AsyncSession = Depends(get_async_db)):
+    await write_kb(db, kb_store.update_course, course_id, {"fees": update.fees})
+    return {"id": course_id, "kb_version": kb_manager.snapshot.version}
+
+@app.delete("/admin/courses/{course_id}", dependencies=[Depends(require_kb_admin)])
+async def retire_course(course_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Retire a course: it stops being suggested, the row stays in the database."""
+    await write_kb(db, kb_store.retire_course, course_id)
+    return {"id": course_id, "retired": True, "kb_version": kb_manager.snapshot.version}
+
+@app.get("/admin/kb/export", dependencies=[Depends(require_kb_admin)])
+async def export_kb(db: AsyncSession = Depends(get_async_db)):
+    """The active catalogue in knowledge_base.json format."""
+    items = await db.run_sync(kb_store.export_items)
+    return JSONResponse(items, headers={"Content-Disposition": "attachment; filename=knowledge_base.json"})
+
+@app.post("/admin/kb/import", dependencies=[Depends(require_kb_admin)])
+async def import_kb(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Replace the whole catalogue with a knowledge_base.json style list (old courses are retired, the new ones get fresh ids)."""
+    try:
+        items = validate_kb(json.loads(await request.body()))
+    except ValueError as e:  # json.JSONDecodeError is a ValueError
+        raise HTTPException(status_code=400, detail=f"Invalid knowledge base: {e}")
+    count = await write_kb(db, kb_store.replace_catalogue, items)
+    return {"courses": count, "kb_version": kb_manager.snapshot.version}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,119 @@
+from bisect import bisect_left
+
+# Minimal in-process metrics with Prometheus text exposition (GET /metrics).
+# Recording is a dict lookup plus an add (histograms: one bisect), so it can stay
+# on in production. Label values are passed positionally in labelnames order and
+# must come from small fixed sets (route templates, caller names), not user input.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labelnames, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_label_text(self.labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to response headers per route (streams keep running after this).",
+    ["method", "route", "status"],
+)
+GROQ_REQUEST_SECONDS = REGISTRY.histogram(
+    "groq_request_duration_seconds", "Groq chat completion latency as seen by the caller.", ["caller", "outcome"],
+)
+GROQ_TOKENS = REGISTRY.counter(
+    "groq_tokens_total", "Tokens reported by Groq usage (coalesced calls counted once; cut-short streams estimated).", ["caller", "kind"],
+)
+AI_FALLBACKS = REGISTRY.counter(
+    "ai_fallbacks_total", "Responses served without Groq (template / keyword-only).", ["kind", "reason"],
+)
+ELIGIBLE_COURSES = REGISTRY.histogram(
+    "eligible_courses", "Courses passing the rules per suggestion request.",
+    buckets=(0, 1, 5, 10, 20, 50, 100, 250, 500, 1000, 5000, 20000),
+)
+DB_COMMIT_SECONDS = REGISTRY.histogram(
+    "db_commit_duration_seconds", "Database commit latency.", ["operation"],
+)
+EMAIL_MESSAGES = REGISTRY.counter(
+    "email_messages_total", "Outbox delivery results (sent, simulated, retry, dead).", ["result"],
+)
@@ -0,0 +1,70 @@
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from database import engine, Base
+import models
+from stats import rebuild_counters
+
+# Schema upgrades for databases created by older versions.
+# create_all() only creates missing tables, so columns and indexes added to an
+# existing table (e.g. applications.created_at, the unique (college, email),
+# (college, phone) and reference_id indexes) are created here, and the application
+# counters are filled in for an existing database. Safe to run on every startup.
+
+
+def find_duplicates(connection, index) -> list:
+    """(*values, count) rows that block a unique index."""
+    columns = list(index.columns)
+    query = select(*columns, func.count()).group_by(*columns).having(func.count() > 1)
+    return connection.execute(query).all()
+
+
+def add_missing_columns(bind, table):
+    """New columns are nullable, so existing rows simply get NULL."""
+    existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+    quote = bind.dialect.identifier_preparer.quote
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            print(f"Migration: added column {table.name}.{column.name}")
+
+
+def backfill_counters(bind):
+    """application_counters is new or was emptied: count the applications already stored."""
+    with bind.connect() as connection:
+        has_counters = connection.execute(select(models.ApplicationCounter.dimension).limit(1)).first() is not None
+        has_applications = connection.execute(select(models.Application.id).limit(1)).first() is not None
+    if has_applications and not has_counters:
+        rebuild_counters(bind)
+        print("Migration: rebuilt application counters from the existing applications")
+
+
+def migrate(bind=engine) -> bool:
+    """Create missing tables, columns and indexes. Returns False if some index could not be created."""
+    Base.metadata.create_all(bind=bind)
+    ok = True
+    for table in Base.metadata.sorted_tables:
+        add_missing_columns(bind, table)
+        for index in table.indexes:
+            try:
+                index.create(bind=bind, checkfirst=True)
+            except (IntegrityError, OperationalError) as e:
+                # Rows submitted before the constraint existed; they have to be
+                # resolved by hand, applicant data is never deleted automatically.
+                ok = False
+                print(f"Migration: could not create index {index.name}: {e.orig}")
+                if not index.unique:
+                    continue
+                names = ", ".join(column.name for column in index.columns)
+                with bind.connect() as connection:
+                    for *values, count in find_duplicates(connection, index):
+                        print(f"  duplicate ({names}) = {tuple(values)} ({count} rows)")
+    backfill_counters(bind)
+    return ok
+
+
+if __name__ == "__main__":
+    # python migrations.py
+    print("Migration complete." if migrate() else "Migration incomplete, resolve the duplicates above and run again.")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Date
+import datetime
+from sqlalchemy import Column, Integer, String, Float, Text, Date, DateTime, Boolean, ForeignKey, Index
 from database import Base
 
 class Application(Base):
@@ -19,4 +20,109 @@ class Application(Base):
     marksPercentage = Column(Float)
     courseApplied = Column(String)
     message = Column(Text, nullable=True)
-    reference_id = Column(String, index=True)
+    reference_id = Column(String)  # Issued by reference_ids.ReferenceAllocator, unique index below
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)  # NULL for rows older than the column
+
+    # One application per college per email and per phone. Enforced by the
+    # database so concurrent submits (double-clicks) cannot both insert, and
+    # the duplicate lookup is an index probe instead of a scan of the college.
+    __table_args__ = (
+        Index("uq_applications_college_email", "college", "email", unique=True),
+        Index("uq_applications_college_phone", "college", "phone", unique=True),
+        Index("uq_applications_reference_id", "reference_id", unique=True),
+        # Dashboard filters, ending in id so keyset pages (id > cursor) stay index scans
+        Index("ix_applications_course_id", "courseApplied", "id"),
+        Index("ix_applications_stream_id", "stream", "id"),
+        Index("ix_applications_qualification_id", "qualification", "id"),
+    )
+
+class CareerMapping(Base):
+    """Cached AI answer for analyze_career_goal (see career_cache.py)."""
+    __tablename__ = "career_mappings"
+
+    goal = Column(String, primary_key=True)      # Normalized career goal
+    kb_hash = Column(String, primary_key=True)   # Hash of the KB course list sent in the prompt
+    courses = Column(Text)                       # JSON list of lowercased course names
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ApplicationCounter(Base):
+    """Application counts per dimension value, kept in step with inserts (see stats.py)."""
+    __tablename__ = "application_counters"
+
+    dimension = Column(String, primary_key=True)  # "college", "courseApplied", "stream" or "community"
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class EmailOutbox(Base):
+    """Queued email, written with the application and sent by email_outbox.OutboxWorker."""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    to_address = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    text_body = Column(Text)
+    html_body = Column(Text)
+    status = Column(String, nullable=False, default="pending")  # pending, sent or dead (gave up)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow)  # Also the claim lease while sending
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+class ReferenceSequence(Base):
+    """Next free reference number per prefix (college abbreviation + year)."""
+    __tablename__ = "reference_sequences"
+
+    prefix = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+class College(Base):
+    """Knowledge base college (see kb_store.py); address and contact are shared by its courses."""
+    __tablename__ = "colleges"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    address = Column(Text, nullable=True)
+    contact = Column(String, nullable=True)
+
+class Course(Base):
+    """Knowledge base course. KB order is id order; retired courses stay for the record."""
+    __tablename__ = "courses"
+
+    id = Column(Integer, primary_key=True)
+    college_id = Column(Integer, ForeignKey("colleges.id"), nullable=False)
+    course_name = Column(String, nullable=False)
+    fees = Column(Integer, nullable=False)
+    minimum_marks = Column(Float, nullable=True)
+    qualification_required = Column(String, nullable=True)
+    retired = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_courses_college_name", "college_id", "course_name"),
+        Index("ix_courses_retired_id", "retired", "id"),
+    )
+
+class CourseStream(Base):
+    """One stream_eligibility entry of a course, in list order."""
+    __tablename__ = "course_streams"
+
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    stream = Column(String, nullable=False)
+
+    __table_args__ = (
+        Index("ix_course_streams_stream", "stream", "course_id"),
+    )
+
+class KBChange(Base):
+    """Change log the app workers poll to patch their in-memory KB (course_id NULL = reload everything)."""
+    __tablename__ = "kb_changes"
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
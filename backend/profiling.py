@@ -0,0 +1,131 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Opt-in per-request stage profiling for /suggest-admission and /ai-chat.
+# A StageProfiler is bound to the request with a ContextVar; code marks its
+# stages with stage(name) (nestable) or lap(name) (time since the previous
+# mark, for splitting a function without re-indenting it). With no profiler
+# bound both are a single ContextVar lookup, so they stay in the hot path.
+
+_current = contextvars.ContextVar("stage_profiler", default=None)
+_NO_STAGE = nullcontext()
+_trace_lock = threading.Lock()
+
+
+class StageProfiler:
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter_ns()
+        self.finished = None
+        self.spans = []  # (path tuple, start_ns, duration_ns)
+        self.counts = {}
+        self._stack = []
+        self._mark = self.started
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter_ns()
+        self._stack.append(name)
+        self._mark = start
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.spans.append((tuple(self._stack), start, end - start))
+            self._stack.pop()
+            self._mark = end
+
+    def lap(self, name: str):
+        now = time.perf_counter_ns()
+        self.spans.append((tuple(self._stack) + (name,), self._mark, now - self._mark))
+        self._mark = now
+
+    def count(self, name: str, value: int):
+        self.counts[name] = value
+
+    def add_span(self, name: str, start_ns: int):
+        """Top-level span for work that ran concurrently with the staged code (leaves stage/lap state alone)."""
+        self.spans.append(((name,), start_ns, time.perf_counter_ns() - start_ns))
+
+    def finish(self):
+        self.finished = time.perf_counter_ns()
+
+    @property
+    def total_ns(self) -> int:
+        return (self.finished or time.perf_counter_ns()) - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. `career;dur=412.3, rules_scoring;dur=1.2, total;dur=420.8`."""
+        entries = [f"{'_'.join(path)};dur={duration / 1e6:.3f}" for path, _, duration in self.spans]
+        entries.append(f"total;dur={self.total_ns / 1e6:.3f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "stages": [
+                {"name": "/".join(path), "start_ms": round((start - self.started) / 1e6, 3),
+                 "duration_ms": round(duration / 1e6, 3)}
+                for path, start, duration in sorted(self.spans, key=lambda span: span[1])
+            ],
+            "counts": self.counts,
+        }
+
+    def collapsed_stacks(self) -> list:
+        """Lines in the collapsed-stack format read by flamegraph.pl / speedscope (self time in µs)."""
+        child_time = {}
+        for path, _, duration in self.spans:
+            parent = path[:-1]
+            child_time[parent] = child_time.get(parent, 0) + duration
+        lines = []
+        for path, _, duration in self.spans:
+            self_us = (duration - child_time.get(path, 0)) // 1000
+            lines.append(f"{';'.join((self.name,) + path)} {max(self_us, 0)}")
+        untracked_us = (self.total_ns - child_time.get((), 0)) // 1000
+        lines.append(f"{self.name} {max(untracked_us, 0)}")
+        return lines
+
+
+def activate(profiler: StageProfiler):
+    """Bind a profiler to the current request; returns the token for deactivate()."""
+    return _current.set(profiler)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current_profiler():
+    return _current.get()
+
+
+def stage(name: str):
+    profiler = _current.get()
+    return profiler.stage(name) if profiler is not None else _NO_STAGE
+
+
+def lap(name: str):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.lap(name)
+
+
+def count(name: str, value: int):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.counts[name] = value
+
+
+def span(name: str, start_ns: int):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.add_span(name, start_ns)
+
+
+def write_trace(path: str, profiler: StageProfiler):
+    """Append the request's collapsed stacks to a local trace file (aggregate with flamegraph.pl)."""
+    text = "\n".join(profiler.collapsed_stacks()) + "\n"
+    with _trace_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(text)
@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+from functools import lru_cache
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import Application, ReferenceSequence
+
+# Reference IDs: <college abbreviation><year><sequence>, e.g. TCA202600042.
+# Sequences live in reference_sequences, one row per abbreviation + year, so IDs
+# are unique (also across colleges sharing an abbreviation). Each app worker
+# reserves a block of numbers with one short transaction and hands them out from
+# memory, so the submit path normally needs no extra DB round-trip. Numbers are
+# increasing within a worker; a restart skips the rest of its block.
+
+IGNORE_WORDS = {"of", "and", "the", "in", "for"}
+
+
+@lru_cache(maxsize=4096)
+def college_abbreviation(college: str) -> str:
+    """First letter of each word in uppercase (at least 2 characters)."""
+    abbr = "".join(word[0].upper() for word in college.split() if word.lower() not in IGNORE_WORDS and word.isalnum())
+    if len(abbr) < 2:
+        abbr = college[:3].upper()
+    return abbr
+
+
+def format_reference_id(prefix: str, number: int) -> str:
+    return f"{prefix}{number:05d}"
+
+
+class ReferenceAllocator:
+    def __init__(self, session_factory, block_size: int = 20):
+        self.session_factory = session_factory
+        self.block_size = block_size
+        self._blocks = {}  # prefix -> [next, end)
+        self._locks = {}
+        self.reservations = 0
+
+    async def _first_free(self, db, prefix: str) -> int:
+        # Older rows used random 5 digit numbers; start above any of them
+        rows = await db.execute(
+            select(Application.reference_id).where(Application.reference_id.startswith(prefix, autoescape=True))
+        )
+        taken = [int(ref[len(prefix):]) for (ref,) in rows if ref[len(prefix):].isdigit()]
+        return max(taken, default=0) + 1
+
+    async def _reserve(self, prefix: str) -> int:
+        """Reserve block_size numbers for this worker; returns the first one."""
+        self.reservations += 1
+        async with self.session_factory() as db:
+            while True:
+                result = await db.execute(
+                    update(ReferenceSequence)
+                    .where(ReferenceSequence.prefix == prefix)
+                    .values(next_value=ReferenceSequence.next_value + self.block_size)
+                )
+                if result.rowcount == 1:
+                    # The row stays locked until commit, so this read is our block
+                    end = (await db.execute(
+                        select(ReferenceSequence.next_value).where(ReferenceSequence.prefix == prefix)
+                    )).scalar_one()
+                    await db.commit()
+                    return end - self.block_size
+                # First ID for this prefix
+                start = await self._first_free(db, prefix)
+                db.add(ReferenceSequence(prefix=prefix, next_value=start + self.block_size))
+                try:
+                    await db.commit()
+                    return start
+                except IntegrityError:
+                    await db.rollback()  # Another worker created it, take a block from that row
+
+    async def allocate(self, college: str, year: int = None) -> str:
+        year = year or datetime.datetime.now().year
+        prefix = f"{college_abbreviation(college)}{year}"
+        block = self._blocks.get(prefix)
+        if block is None or block[0] >= block[1]:
+            lock = self._locks.setdefault(prefix, asyncio.Lock())
+            async with lock:
+                block = self._blocks.get(prefix)
+                if block is None or block[0] >= block[1]:
+                    start = await self._reserve(prefix)
+                    block = self._blocks[prefix] = [start, start + self.block_size]
+        number = block[0]
+        block[0] += 1
+        return format_reference_id(prefix, number)
+
+    def stats(self) -> dict:
+        return {
+            "block_size": self.block_size,
+            "reservations": self.reservations,
+            "cached_abbreviations": college_abbreviation.cache_info().currsize,
+            "open_blocks": {prefix: end - nxt for prefix, (nxt, end) in self._blocks.items()},
+        }
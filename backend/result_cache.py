@@ -0,0 +1,89 @@
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+# Result cache for /suggest-admission.
+# Apart from name/dob, the response is a pure function of the StudentFlags, the AI
+# career mapping and the KB snapshot. The key is therefore built from the flags
+# (subject names are already folded into has_math / strong_bio / ...), with marks
+# reduced to the band between the thresholds the rules compare against, and the AI
+# course set. Entries belong to one KB version: a reload changes the version, so an
+# old result can never be returned, and the old entries are dropped when it is seen.
+
+# Every marks threshold used by rule_engine / vector_engine. Keep in sync with the rules.
+MARK_THRESHOLDS = (35, 60, 65, 70, 80)
+
+RESULT_CACHE_LOOKUPS = REGISTRY.counter(
+    "suggestion_cache_lookups_total", "Suggestion result cache lookups.", ["result"],
+)
+
+
+def marks_band(marks: float) -> int:
+    """0 below 35, 1 for 35-59.99, ... 5 for 80 and above."""
+    return bisect_right(MARK_THRESHOLDS, marks)
+
+
+def canonical_key(flags, ai_suggested_courses_lower) -> tuple:
+    return (
+        flags._replace(marks=marks_band(flags.marks)),
+        tuple(sorted(set(ai_suggested_courses_lower or ()))),
+    )
+
+
+class ResultCache:
+    """LRU with a TTL, bounded to max_entries results, for one KB version at a time."""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.kb_version = None
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_version(self, kb_version: str):
+        if kb_version != self.kb_version:
+            self._entries.clear()
+            self.kb_version = kb_version
+
+    def get(self, kb_version: str, key):
+        if self.max_entries <= 0:
+            return None
+        self._check_version(kb_version)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            RESULT_CACHE_LOOKUPS.inc("hit")
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]  # Expired
+        self.misses += 1
+        RESULT_CACHE_LOOKUPS.inc("miss")
+        return None
+
+    def put(self, kb_version: str, key, value):
+        if self.max_entries <= 0:
+            return
+        self._check_version(kb_version)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "kb_version": self.kb_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,308 @@
+import heapq
+import math
+import re
+
+import numpy as np
+
+# Inverted index over the knowledge base for /ai-chat retrieval.
+# Built once per KB load and patched per changed course after that; a query only
+# touches the postings of its own terms, so retrieval cost no longer grows with
+# the size of the catalogue.
+
+STOP_WORDS = {
+    "what", "which", "where", "when", "how", "who", "whom", "whose", "why",
+    "is", "are", "was", "were", "be", "been", "being",
+    "the", "a", "an", "and", "or", "but", "if", "then", "else",
+    "at", "by", "for", "from", "in", "into", "of", "off", "on", "onto", "out", "over", "to", "up", "with",
+    "can", "could", "will", "would", "shall", "should", "may", "might", "must",
+    "tell", "me", "about", "give", "list", "show", "find", "best", "good", "top", "colleges", "college", "courses"
+}
+
+# Short forms students type -> words used in the course names
+ACRONYMS = {
+    "cse": "computer science engineering",
+    "ece": "electronics communication engineering",
+    "eee": "electrical electronics engineering",
+    "it": "information technology",
+    "bca": "bachelor computer applications",
+    "bba": "bachelor business administration",
+    "ba": "bachelor arts",
+    "mbbs": "medicine medical",
+    "mech": "mechanical engineering",
+}
+# Acronyms that are also everyday words: only used when typed in capitals ("IT", not "is it good?")
+UPPERCASE_ONLY = {"it"}
+EXPANSION_WEIGHT = 0.5  # Expanded words count less than what the student actually typed
+
+# Field weights (course name matters most, then college, then stream eligibility)
+FIELD_WEIGHTS = {"course": 3.0, "college": 1.5, "stream": 1.0}
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*\.?")
+_QUERY_TOKEN_RE = re.compile(_TOKEN_RE.pattern, re.IGNORECASE)  # Keeps the case for UPPERCASE_ONLY
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens; dotted abbreviations are joined (B.Sc -> bsc, M.I.E.T -> miet)."""
+    return [t.replace(".", "") for t in _TOKEN_RE.findall(text.lower())]
+
+
+def document_terms(item) -> dict:
+    return {
+        "course": tokenize(item["course_name"]),
+        "college": tokenize(item["college_name"]),
+        "stream": tokenize(" ".join(item.get("stream_eligibility", []))),
+    }
+
+
+class CourseIndex:
+    """Documents are keyed by a stable key that sorts in KB order (the course id for
+    the database KB, the list position otherwise), so courses can be added, changed
+    or removed without renumbering the rest: see updated()."""
+
+    def __init__(self, kb: list, keys=None):
+        self.docs = {}  # key -> KB record
+        self.postings = {field: {} for field in FIELD_WEIGHTS}  # field -> term -> {key: tf}
+        self.lengths = {field: {} for field in FIELD_WEIGHTS}   # field -> key -> term count
+        self.length_totals = {field: 0 for field in FIELD_WEIGHTS}
+        self.doc_freq = {}  # Number of courses containing each term in any field (for idf)
+        self._overview = None
+        for key, item in zip(range(len(kb)) if keys is None else keys, kb):
+            self._add(key, item)
+
+    def _writable_postings(self, field: str, term: str, copied) -> dict:
+        """The {key: tf} dict of a term, copied first if it may be shared with an older index."""
+        field_postings = self.postings[field]
+        doc_tfs = field_postings.get(term)
+        if doc_tfs is None:
+            doc_tfs = field_postings[term] = {}
+        elif copied is not None and (field, term) not in copied:
+            doc_tfs = field_postings[term] = dict(doc_tfs)
+        if copied is not None:
+            copied.add((field, term))
+        return doc_tfs
+
+    def _add(self, key, item, copied=None):
+        self.docs[key] = item
+        doc_terms = set()
+        for field, terms in document_terms(item).items():
+            self.lengths[field][key] = len(terms)
+            self.length_totals[field] += len(terms)
+            for term in terms:
+                doc_tfs = self._writable_postings(field, term, copied)
+                doc_tfs[key] = doc_tfs.get(key, 0) + 1
+            doc_terms.update(terms)
+        for term in doc_terms:
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+
+    def _remove(self, key, copied):
+        item = self.docs.pop(key)
+        doc_terms = set()
+        for field, terms in document_terms(item).items():
+            self.length_totals[field] -= self.lengths[field].pop(key)
+            for term in set(terms):
+                doc_tfs = self._writable_postings(field, term, copied)
+                del doc_tfs[key]
+                if not doc_tfs:
+                    del self.postings[field][term]
+            doc_terms.update(terms)
+        for term in doc_terms:
+            self.doc_freq[term] -= 1
+            if not self.doc_freq[term]:
+                del self.doc_freq[term]
+
+    def updated(self, changes: dict) -> "CourseIndex":
+        """New index with changes ({key: record, or None to remove}) applied.
+
+        Only the changed courses are re-tokenized; postings of untouched terms are
+        shared with this index, which stays valid for requests still using it.
+        """
+        index = object.__new__(CourseIndex)
+        index.docs = dict(self.docs)
+        index.postings = {field: dict(field_postings) for field, field_postings in self.postings.items()}
+        index.lengths = {field: dict(lengths) for field, lengths in self.lengths.items()}
+        index.length_totals = dict(self.length_totals)
+        index.doc_freq = dict(self.doc_freq)
+        index._overview = None
+        copied = set()
+        for key, item in changes.items():
+            if key in index.docs:
+                index._remove(key, copied)
+            if item is not None:
+                index._add(key, item, copied)
+        return index
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _avg_length(self, field: str) -> float:
+        return (self.length_totals[field] / len(self) if len(self) else 0.0) or 1.0
+
+    @property
+    def overview(self) -> list:
+        """Summary used when the question has no searchable words (built on first use)."""
+        if self._overview is None:
+            overview = []
+            seen = set()
+            for key in sorted(self.docs):
+                item = self.docs[key]
+                pair = (item["college_name"], item["course_name"])
+                if pair not in seen:
+                    overview.append({"college": item["college_name"], "course": item["course_name"]})
+                    seen.add(pair)
+            self._overview = overview
+        return self._overview
+
+    def query_terms(self, query: str) -> dict:
+        """Query words (stop words removed) with acronym expansion, as term -> weight."""
+        terms = {}
+        for typed in _QUERY_TOKEN_RE.findall(query):
+            # Stop words are checked before dots are dropped, so "B.E" is kept but "be" is not
+            typed = typed.rstrip(".")
+            raw = typed.lower()
+            token = raw.replace(".", "")
+            if len(token) < 2 or raw in STOP_WORDS:
+                continue
+            if token in UPPERCASE_ONLY and not typed.isupper():
+                continue
+            terms[token] = 1.0
+            for extra in ACRONYMS.get(token, "").split():
+                terms.setdefault(extra, EXPANSION_WEIGHT)
+        return terms
+
+    def _idf(self, term: str) -> float:
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def search_terms(self, terms: dict, limit: int = 20) -> list:
+        """BM25 ranking over the postings of the given terms."""
+        if not terms:
+            return self.overview[:30]
+
+        scores = {}
+        for term, query_weight in terms.items():
+            idf = self._idf(term) * query_weight
+            for field, weight in FIELD_WEIGHTS.items():
+                doc_tfs = self.postings[field].get(term)
+                if not doc_tfs:
+                    continue
+                lengths = self.lengths[field]
+                avg_length = self._avg_length(field)
+                for key, tf in doc_tfs.items():
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[key] / avg_length))
+                    scores[key] = scores.get(key, 0.0) + weight * idf * norm
+
+        # Highest score first, KB order on ties
+        top = heapq.nsmallest(limit, scores.items(), key=lambda x: (-x[1], x[0]))
+        return [self.docs[key] for key, _ in top]
+
+    def search(self, query: str, limit: int = 20) -> list:
+        return self.search_terms(self.query_terms(query), limit)
+
+
+class CompactCourseIndex(CourseIndex):
+    """CourseIndex for a CompactKB, without Python objects per course.
+
+    Every field of a compact course is one interned value (course name, college,
+    stream list), so terms, lengths and postings are kept per value and mapped to
+    the courses that share it through the id columns of the mmap. Scores and
+    ranking are exactly those of CourseIndex over the same records. Read-only:
+    a compact KB is rebuilt, not patched.
+    """
+
+    # BM25 field -> column holding the interned value the field is built from
+    FIELD_COLUMNS = {"course": "name_id", "college": "college_id", "stream": "streams_id"}
+
+    def __init__(self, kb):
+        self.kb = kb
+        self.size = len(kb)
+        self.postings = {}      # field -> term -> {group: tf}
+        self.group_of = {}      # field -> group of each course
+        self.members = {}       # field -> group -> course positions
+        self.group_lengths = {}  # field -> term count of each group
+        self.length_totals = {}
+        self._overview = None
+        columns = kb.columns
+        group_terms = {}
+        for field, column in self.FIELD_COLUMNS.items():
+            values, group_of = np.unique(columns[column], return_inverse=True)
+            group_of = group_of.reshape(-1).astype(np.int32)
+            order = np.argsort(group_of, kind="stable").astype(np.int32)
+            bounds = np.searchsorted(group_of[order], np.arange(len(values) + 1))
+            members = [order[bounds[g]:bounds[g + 1]] for g in range(len(values))]
+            # Any member's record gives the group's text
+            terms = [document_terms(kb[int(m[0])])[field] for m in members]
+            postings = {}
+            for group, group_tokens in enumerate(terms):
+                for term in group_tokens:
+                    doc_tfs = postings.setdefault(term, {})
+                    doc_tfs[group] = doc_tfs.get(group, 0) + 1
+            lengths = np.array([len(t) for t in terms], dtype=np.int64)
+            self.postings[field] = postings
+            self.group_of[field] = group_of
+            self.members[field] = members
+            self.group_lengths[field] = lengths
+            self.length_totals[field] = int((lengths * np.array([len(m) for m in members], dtype=np.int64)).sum())
+            group_terms[field] = [frozenset(t) for t in terms]
+
+        # Courses containing each term in any field, counted once per distinct field combination
+        self.doc_freq = {}
+        if self.size:
+            combos, counts = np.unique(
+                np.stack([self.group_of[field] for field in FIELD_WEIGHTS], axis=1), axis=0, return_counts=True,
+            )
+            for combo, count in zip(combos.tolist(), counts.tolist()):
+                doc_terms = set()
+                for field, group in zip(FIELD_WEIGHTS, combo):
+                    doc_terms |= group_terms[field][group]
+                for term in doc_terms:
+                    self.doc_freq[term] = self.doc_freq.get(term, 0) + count
+
+    def __len__(self):
+        return self.size
+
+    def updated(self, changes: dict):
+        raise ValueError("a compact index is rebuilt, not patched")
+
+    @property
+    def overview(self) -> list:
+        if self._overview is None:
+            overview = []
+            seen_ids = set()
+            seen = set()
+            columns = self.kb.columns
+            for position, ids in enumerate(zip(columns["college_id"].tolist(), columns["name_id"].tolist())):
+                if ids in seen_ids:
+                    continue
+                seen_ids.add(ids)
+                item = self.kb[position]
+                pair = (item["college_name"], item["course_name"])
+                if pair not in seen:
+                    overview.append({"college": item["college_name"], "course": item["course_name"]})
+                    seen.add(pair)
+            self._overview = overview
+        return self._overview
+
+    def search_terms(self, terms: dict, limit: int = 20) -> list:
+        if not terms:
+            return self.overview[:30]
+
+        # Same additions per course, in the same order, as CourseIndex.search_terms
+        scores = np.zeros(self.size)
+        for term, query_weight in terms.items():
+            idf = self._idf(term) * query_weight
+            for field, weight in FIELD_WEIGHTS.items():
+                group_tfs = self.postings[field].get(term)
+                if not group_tfs:
+                    continue
+                lengths = self.group_lengths[field]
+                avg_length = self._avg_length(field)
+                for group, tf in group_tfs.items():
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * int(lengths[group]) / avg_length))
+                    scores[self.members[field][group]] += weight * idf * norm
+
+        # Highest score first, KB order on ties (every matched course scores above 0)
+        matched = np.flatnonzero(scores)
+        top = matched[np.lexsort((matched, -scores[matched]))[:limit]]
+        return [self.kb[int(position)] for position in top]
@@ -0,0 +1,333 @@
+import heapq
+from typing import NamedTuple
+
+from profiling import lap
+from course_features import (
+    CATEGORY_ENGINEERING, CATEGORY_BSC, CATEGORY_BCA, CATEGORY_COMMERCE, CATEGORY_ARTS,
+    BSC_COMPUTER, BSC_BIO,
+    BUCKET_ENGINEERING, BUCKET_ARTS, BUCKET_DIPLOMA, BUCKET_OTHER,
+)
+
+# Rule-based eligibility and scoring for /suggest-admission.
+# No FastAPI/DB imports here so the rules can be reused by other engines and worker processes.
+
+
+class StudentFlags(NamedTuple):
+    qualification: str
+    stream: str
+    marks: float
+    has_math: bool
+    has_physics: bool
+    has_computer: bool
+    has_bio_subject: bool        # Biology or Botany
+    has_commerce_subject: bool   # Commerce, Accountancy or Business
+    strong_math: bool            # 80+ in Maths
+    strong_physics: bool         # 80+ in Physics
+    strong_bio: bool             # 80+ in Biology
+    has_career: bool
+    wants_computer: bool
+    wants_medical: bool
+    preferred_lower: str
+
+
+def has_subject(subject_marks: dict, sub_name: str, min_mark=35) -> bool:
+    """Check if the student has a specific subject with passing marks."""
+    for key, mark in subject_marks.items():
+        if sub_name.lower() in key.lower():
+            try:
+                if float(mark) >= min_mark:
+                    return True
+            except (ValueError, TypeError):
+                continue # Skip invalid marks
+    return False
+
+
+def build_student_flags(student) -> StudentFlags:
+    """Evaluate the student side of the rules once per request."""
+    subject_marks = student.subject_marks
+    interest_lower = student.career_interest.lower()
+    return StudentFlags(
+        qualification=student.qualification,
+        stream=student.stream,
+        marks=student.marks,
+        has_math=has_subject(subject_marks, "Math"),
+        has_physics=has_subject(subject_marks, "Physics"),
+        has_computer=has_subject(subject_marks, "Computer"),
+        has_bio_subject=has_subject(subject_marks, "Biology") or has_subject(subject_marks, "Botany"),
+        has_commerce_subject=(
+            has_subject(subject_marks, "Commerce")
+            or has_subject(subject_marks, "Accountancy")
+            or has_subject(subject_marks, "Business")
+        ),
+        strong_math=has_subject(subject_marks, "Math", 80),
+        strong_physics=has_subject(subject_marks, "Physics", 80),
+        strong_bio=has_subject(subject_marks, "Biology", 80),
+        has_career=bool(student.career_interest),
+        wants_computer=any(x in interest_lower for x in ["computer", "code", "software"]),
+        wants_medical="doctor" in interest_lower or "medical" in interest_lower,
+        preferred_lower=student.preferred_course.lower(),
+    )
+
+
+def score_courses(features: list, fees: list, flags: StudentFlags, ai_suggested_courses_lower: list) -> list:
+    """Apply RULES 1-6 to every course.
+
+    Returns unsorted (-relevance_score, fees, kb_index) tuples for the eligible
+    courses: their natural order is relevance (high -> low), fees (low -> high),
+    then KB order. Pass them to select_top(); reasons come from match_reason().
+    """
+    # RULE 3 hard limit from chatflow.md: below 35% nothing is eligible
+    if flags.marks < 35:
+        return []
+
+    (qualification, stream, marks, has_math, has_physics, has_computer, has_bio_subject,
+     has_commerce_subject, strong_math, strong_physics, strong_bio, has_career,
+     wants_computer, wants_medical, preferred_lower) = flags
+
+    ai_names = frozenset(ai_suggested_courses_lower or ())
+
+    # Eligibility first (RULES 1-3), then scoring of the survivors
+    eligible = []
+    for index, feat in enumerate(features):
+        # ==========================================
+        #  RULE 1: Qualification Based Filtering
+        # ==========================================
+        if qualification == "10th":
+            # 10th -> ONLY Diploma ("3 Years Full Time")
+            if not feat.is_diploma:
+                continue # Strictly no degrees for 10th
+
+        elif qualification == "12th":
+            # 12th -> Degrees OR Diploma (Lateral Entry)
+            if not feat.is_diploma:
+                # ==========================================
+                #  RULE 2: Stream & Subject Eligibility (Indian Context)
+                # ==========================================
+                is_degree_eligible = False
+                category = feat.category
+
+                # A. ENGINEERING (B.E / B.Tech)
+                if category == CATEGORY_ENGINEERING:
+                    # Commerce/Arts students -> NO Engineering (Stream Mismatch)
+                    if stream in ["Commerce", "Arts"]:
+                        pass
+
+                    # Vocational -> Eligible (Generally)
+                    elif stream == "Vocational":
+                        is_degree_eligible = True
+
+                    # Science (Bio/Math/Computer)
+                    else:
+                        # Bio students -> Only Biomedical/Bio-related unless they have Math
+                        if stream == "Biology" and not has_math:
+                            if feat.is_bio_engineering:
+                                is_degree_eligible = True
+
+                        # Math/Computer students -> All Engineering
+                        elif has_math or has_physics:
+                            is_degree_eligible = True
+
+                        # CSE requires Math or Computer Science
+                        # If stream is CS, we assume they have it.
+                        if feat.is_computer and stream != "Computer Science" and not (has_math or has_computer):
+                            is_degree_eligible = False
+
+                # B. ARTS & SCIENCE (B.Sc, BCA, B.Com, B.A)
+                elif category == CATEGORY_BSC:
+                    # B.Sc Computer/Data -> Needs Math or CS
+                    if feat.bsc_kind == BSC_COMPUTER:
+                        is_degree_eligible = stream == "Computer Science" or has_math or has_computer
+                    # B.Sc Bio/Micro -> Needs Biology
+                    elif feat.bsc_kind == BSC_BIO:
+                        is_degree_eligible = stream == "Biology" or has_bio_subject
+                    else:
+                        # General B.Sc -> Science Stream mostly
+                        is_degree_eligible = stream not in ["Commerce", "Arts"]
+
+                elif category == CATEGORY_BCA:
+                    # BCA -> Any stream, but Math/CS preferred.
+                    is_degree_eligible = True
+
+                elif category == CATEGORY_COMMERCE:
+                    # FIX: allow Commerce stream explicitly
+                    is_degree_eligible = stream == "Commerce" or has_commerce_subject
+
+                elif category == CATEGORY_ARTS:
+                    is_degree_eligible = True # Open to all
+
+                # Fallback
+                else:
+                    is_degree_eligible = stream in feat.stream_eligibility
+
+                if not is_degree_eligible:
+                    continue
+
+        else:
+            continue
+
+        # ==========================================
+        #  RULE X: Medical (MBBS/BDS) - ENABLED
+        # ==========================================
+        # if any(x in course_name_lower for x in ["mbbs", "bds", "bachelor of medicine", "bachelor of dental"]):
+        #     continue
+
+        # ==========================================
+        #  RULE 3: Percentage Logic (Tiered)
+        # ==========================================
+        # Engineering Degree Rules
+        if feat.is_engineering and not feat.is_diploma:
+            if marks < 60 and stream != "Vocational":
+                # < 60% -> Suggest Diploma instead of Degree
+                continue
+
+            # High Demand Branches (CSE/ECE/Data) need 70%+
+            if feat.is_high_demand and marks < 65: # Relaxed slightly from 70 to 65 for usability
+                continue
+
+        eligible.append((index, feat))
+    lap("eligibility")
+
+    candidates = []
+    for index, feat in eligible:
+        # ==========================================
+        #  SCORING: Rules 4, 5, 6 (reasons: see match_reason)
+        # ==========================================
+        relevance_score = 50 # Base
+
+        # 1. High Mark Boost (Rule 6: Top Colleges/Courses)
+        if marks >= 80:
+            relevance_score += 20
+        elif marks >= 70:
+            relevance_score += 10
+
+        # 2. Subject Strength (Rule 4)
+        if feat.is_engineering:
+            if strong_math:
+                relevance_score += 15
+            if strong_physics:
+                relevance_score += 10
+
+        if feat.is_bio and strong_bio:
+             relevance_score += 15
+
+        # 3. Career Interest Match (Rule 5)
+        if has_career:
+            if wants_computer:
+                if feat.is_computer_career:
+                    relevance_score += 25
+
+            elif wants_medical:
+                 if feat.is_medical_career:
+                    relevance_score += 25
+                    relevance_score += 25
+
+            # AI Direct Match Boost
+            if feat.name_lower in ai_names:
+                relevance_score += 40 # Huge boost for AI match
+
+        # 4. Diploma vs Degree Weighting (Rule 1 refinement)
+        if qualification == "12th":
+            if feat.is_diploma:
+                # Always show Diplomas as valid options (Lateral Entry)
+                # Boost if marks are low (Primary option)
+                if marks < 65:
+                    relevance_score += 25
+                else:
+                    # For high marks, we don't penalize, just provide a smaller boost compared to degrees
+                    relevance_score += 5
+            else:
+                # Degree Courses
+                if marks >= 70:
+                    relevance_score += 15 # Prioritize Degrees for good students
+
+        # 5. Preferred Course Match (Rule 10)
+        if preferred_lower:
+             if preferred_lower in feat.name_lower:
+                 relevance_score += 100 # Top Priority
+
+        candidates.append((-relevance_score, fees[index], index))
+
+    lap("scoring")
+    return candidates
+
+
+def apply_ai_boost(candidates: list, features: list, flags: StudentFlags, ai_suggested_courses_lower: list) -> list:
+    """The RULE 5 AI match boost (+40) as a final re-rank of candidates scored without the AI mapping.
+
+    Scores are additive, so this gives the same candidates as passing the mapping to score_courses().
+    """
+    if not (flags.has_career and ai_suggested_courses_lower):
+        return candidates
+    ai_names = frozenset(ai_suggested_courses_lower)
+    return [
+        (neg_score - 40, fee, index) if features[index].name_lower in ai_names else (neg_score, fee, index)
+        for neg_score, fee, index in candidates
+    ]
+
+
+def match_reason(feat, flags: StudentFlags, ai_suggested_courses_lower: list) -> str:
+    """The match_reason text for one eligible course, in the order the scoring rules apply."""
+    marks = flags.marks
+    match_reasons = []
+
+    # Qualification Match
+    if feat.is_diploma:
+        if flags.qualification == "10th":
+            match_reasons.append("**3 Years Full Time**")
+        else:
+            match_reasons.append("**Direct 2nd Year (Lateral Entry)**")
+
+    if marks >= 80:
+        match_reasons.append("Excellent academic record.")
+    if feat.is_engineering and flags.strong_math:
+        match_reasons.append("Strong Maths score.")
+    if feat.is_bio and flags.strong_bio:
+        match_reasons.append("Strong Biology score.")
+
+    if flags.has_career:
+        if flags.wants_computer:
+            if feat.is_computer_career:
+                match_reasons.append("Matches your career goal.")
+        elif flags.wants_medical:
+            if feat.is_medical_career:
+                match_reasons.append("Aligns with medical aspirations.")
+        if ai_suggested_courses_lower and feat.name_lower in ai_suggested_courses_lower:
+            match_reasons.append("🤖 AI Recommended for your Career Goal")
+
+    if flags.qualification == "12th" and feat.is_diploma:
+        if marks < 65:
+            match_reasons.append("Recommended foundation course.")
+        else:
+            match_reasons.append("Direct 2nd Year Option.")
+
+    if flags.preferred_lower and flags.preferred_lower in feat.name_lower:
+        match_reasons.append("✨ Your Preferred Course")
+
+    if not match_reasons:
+        match_reasons.append("Eligible option.")
+    return " ".join(match_reasons)
+
+
+# Response size: the top 50, or for 12th grade the best of each balancing bucket
+# (20 Engineering, 20 Arts/Science, 20 Diploma, 10 other), in this order.
+TOP_K = 50
+BALANCE_QUOTAS = ((BUCKET_ENGINEERING, 20), (BUCKET_ARTS, 20), (BUCKET_DIPLOMA, 20), (BUCKET_OTHER, 10))
+
+
+def select_top(candidates: list, features: list, qualification: str) -> list:
+    """The (-relevance_score, fees, kb_index) candidates that are actually returned, in response order.
+
+    Heap selection instead of sorting every eligible course. kb_index is the last
+    key, so ties keep KB order exactly like the stable sort did.
+    """
+    if qualification != "12th":
+        selected = heapq.nsmallest(TOP_K, candidates)
+    else:
+        buckets = {bucket: [] for bucket, _ in BALANCE_QUOTAS}
+        for candidate in candidates:
+            buckets[features[candidate[2]].balance_bucket].append(candidate)
+        selected = []
+        for bucket, quota in BALANCE_QUOTAS:
+            selected.extend(heapq.nsmallest(quota, buckets[bucket]))
+    lap("select")
+    return selected
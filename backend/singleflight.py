@@ -0,0 +1,54 @@
+import asyncio
+import hashlib
+import json
+
+# Request coalescing ("single flight") for outbound AI calls.
+# Concurrent callers asking for the same thing await one shared in-flight call
+# instead of each sending an identical request upstream. The shared call keeps
+# running while anybody still waits for it, and is cancelled when the last
+# waiter goes away (e.g. every client of a stream disconnected).
+
+
+def fingerprint(payload: dict) -> str:
+    """Stable hash of a request payload (model, messages, sampling params)."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Task
+        self._waiters = {}    # asyncio.Task -> callers still awaiting it
+        self.calls = 0        # Calls actually sent upstream
+        self.coalesced = 0    # Callers that joined an existing call
+
+    async def do(self, key: str, call):
+        """Run call() once per key at a time; concurrent callers share its result (or exception)."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield: one caller disconnecting must not cancel the call for everybody else
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()  # Nobody is left to use the result
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved so an unawaited failure isn't logged as "never retrieved"
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,83 @@
+from sqlalchemy import delete, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import Application, ApplicationCounter
+
+# Counter tables for the dashboard summary.
+# submit_application bumps one row per dimension in the same transaction as the
+# insert, so /applications/stats reads O(number of groups) rows no matter how
+# many applications exist. migrate() fills them in for applications submitted before
+# the table existed; `python stats.py` rebuilds the counters from scratch.
+
+DIMENSIONS = ("college", "courseApplied", "stream", "community")
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def counter_keys(application) -> list:
+    return [(dimension, getattr(application, dimension) or "") for dimension in DIMENSIONS]
+
+
+async def _bump(db, dimension: str, value: str) -> int:
+    result = await db.execute(
+        update(ApplicationCounter)
+        .where(ApplicationCounter.dimension == dimension, ApplicationCounter.value == value)
+        .values(count=ApplicationCounter.count + 1)
+    )
+    return result.rowcount
+
+
+async def increment_counters(db, application):
+    """Add one to each of the application's counters. Runs inside the caller's transaction."""
+    upsert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    for dimension, value in counter_keys(application):
+        if upsert is not None:
+            statement = upsert(ApplicationCounter).values(dimension=dimension, value=value, count=1)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=["dimension", "value"],
+                set_={"count": ApplicationCounter.count + 1},
+            ))
+            continue
+        # Other databases: update, insert the first time a value is seen
+        if await _bump(db, dimension, value):
+            continue
+        try:
+            # Savepoint, so losing the race below doesn't roll back the application itself
+            async with db.begin_nested():
+                db.add(ApplicationCounter(dimension=dimension, value=value, count=1))
+        except IntegrityError:
+            # A concurrent first submission inserted this counter; count on top of it
+            await _bump(db, dimension, value)
+
+
+async def read_stats(db) -> dict:
+    stats = {dimension: {} for dimension in DIMENSIONS}
+    rows = await db.execute(select(ApplicationCounter.dimension, ApplicationCounter.value, ApplicationCounter.count))
+    for dimension, value, count in rows:
+        stats.setdefault(dimension, {})[value] = count
+    stats["total"] = sum(stats["college"].values())
+    return stats
+
+
+def rebuild_counters(bind):
+    """Recount everything from the applications table in one transaction."""
+    with bind.begin() as connection:
+        connection.execute(delete(ApplicationCounter))
+        for dimension in DIMENSIONS:
+            column = func.coalesce(Application.__table__.c[dimension], "")
+            connection.execute(
+                ApplicationCounter.__table__.insert().from_select(
+                    ["dimension", "value", "count"],
+                    select(literal(dimension), column, func.count()).group_by(column),
+                )
+            )
+
+
+if __name__ == "__main__":
+    # python stats.py  (one-off rebuild, e.g. after upgrading an existing applications.db)
+    from database import engine
+    from migrations import migrate
+    migrate()
+    rebuild_counters(engine)
+    print("Application counters rebuilt.")
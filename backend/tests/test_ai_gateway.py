@@ -0,0 +1,136 @@
+import asyncio
+
+import httpx
+import pytest
+from groq import APIConnectionError
+
+from ai_gateway import CircuitBreaker, CircuitOpenError, OutboundManager
+
+# Circuit breaker behaviour of the outbound Groq manager (no network: make_call is a fake).
+
+
+def make_manager(reset_timeout: float = 0.05) -> OutboundManager:
+    return OutboundManager(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout))
+
+
+async def open_breaker(manager: OutboundManager):
+    async def failing():
+        raise APIConnectionError(request=httpx.Request("POST", "http://groq.test"))
+
+    with pytest.raises(APIConnectionError):
+        await manager.call(failing)
+    assert manager.breaker.state == "open"
+
+
+def test_open_breaker_rejects_calls():
+    async def scenario():
+        manager = make_manager(reset_timeout=60)
+        await open_breaker(manager)
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(CircuitOpenError):
+            await manager.call(ok)
+        assert not manager.available()
+
+    asyncio.run(scenario())
+
+
+def test_successful_trial_closes_breaker():
+    async def scenario():
+        manager = make_manager()
+        await open_breaker(manager)
+        await asyncio.sleep(0.06)
+
+        async def ok():
+            return "ok"
+
+        assert await manager.call(ok) == "ok"
+        assert manager.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_does_not_wedge_breaker():
+    async def scenario():
+        manager = make_manager()
+        await open_breaker(manager)
+        await asyncio.sleep(0.06)
+        assert manager.breaker.state == "half_open"
+
+        started = asyncio.Event()
+
+        async def hangs():
+            started.set()
+            await asyncio.sleep(60)
+
+        trial = asyncio.create_task(manager.call(hangs))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        # No verdict from the cancelled trial, so the next call is the new trial
+        async def ok():
+            return "ok"
+
+        assert await manager.call(ok) == "ok"
+        assert manager.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def flaky(failures: int):
+    """make_call that fails with a connection error `failures` times, then succeeds."""
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise APIConnectionError(request=httpx.Request("POST", "http://groq.test"))
+        return "ok"
+
+    return call, attempts
+
+
+def test_retries_count_as_one_failure():
+    async def scenario():
+        manager = OutboundManager(max_retries=3, base_delay=0.001,
+                                  breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        # Succeeds on the last retry: no failure at all
+        call, attempts = flaky(3)
+        assert await manager.call(call) == "ok"
+        assert len(attempts) == 4 and manager.breaker.failures == 0
+
+        # All four attempts fail: one failed request, the breaker stays closed
+        call, attempts = flaky(10)
+        with pytest.raises(APIConnectionError):
+            await manager.call(call)
+        assert len(attempts) == 4
+        assert manager.breaker.failures == 1 and manager.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_non_retryable_error_does_not_close_half_open_breaker():
+    async def scenario():
+        manager = make_manager()
+        await open_breaker(manager)
+        await asyncio.sleep(0.06)
+
+        async def bad_request():
+            raise ValueError("400: bad request")
+
+        with pytest.raises(ValueError):
+            await manager.call(bad_request)
+        # Groq's health is still unconfirmed, but the next call may be the trial
+        assert manager.breaker.state == "half_open"
+
+        async def ok():
+            return "ok"
+
+        assert await manager.call(ok) == "ok"
+        assert manager.breaker.state == "closed"
+
+    asyncio.run(scenario())
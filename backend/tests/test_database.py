@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from database import AsyncSessionLocal, to_async_url
+from models import Application
+
+# The async engine used by the request handlers, on whatever database the suite runs
+# against (SQLite by default, PostgreSQL in CI via TEST_DATABASE_URL).
+
+
+def test_async_driver_urls():
+    assert to_async_url("sqlite:///./applications.db") == "sqlite+aiosqlite:///./applications.db"
+    assert to_async_url("postgresql://u:p@db/admissions") == "postgresql+asyncpg://u:p@db/admissions"
+    assert to_async_url("mysql+pymysql://u:p@db/admissions") == "mysql+aiomysql://u:p@db/admissions"
+    assert to_async_url("postgresql+asyncpg://u:p@db/a") == "postgresql+asyncpg://u:p@db/a"
+
+
+def application(**fields) -> Application:
+    values = dict(college="Test College", studentName="Asha", email="asha@example.com", phone="9000000001",
+                  courseApplied="BCA", stream="Commerce", community="BC", reference_id=None)
+    values.update(fields)
+    return Application(**values)
+
+
+def test_async_round_trip(db_engine, run_async):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            db.add(application(reference_id="TST-1"))
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(Application.studentName, Application.reference_id))).all()
+        assert [tuple(row) for row in rows] == [("Asha", "TST-1")]
+
+    run_async(scenario())
+
+
+def test_unique_index_rejects_duplicates(db_engine, run_async):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            db.add(application())
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            db.add(application(phone="9000000002"))  # Same college and email
+            with pytest.raises(IntegrityError):
+                await db.commit()
+
+    run_async(scenario())
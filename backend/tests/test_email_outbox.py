@@ -0,0 +1,149 @@
+import asyncio
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from email_outbox import OutboxWorker
+from models import EmailOutbox
+
+# OutboxWorker against a local SMTP server (aiosmtpd), on the test database.
+
+
+class RecordingHandler:
+    """Accepts everything except recipients starting with "bounce" (550)."""
+
+    def __init__(self):
+        self.messages = []  # (session id, recipients)
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((id(session), list(envelope.rcpt_tos)))
+        return "250 Message accepted"
+
+
+def accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """start() runs a local SMTP server on a fixed port (it can be started late to simulate an outage)."""
+    handler = RecordingHandler()
+    port = free_port()
+    controllers = []
+
+    def start():
+        controller = Controller(handler, hostname="127.0.0.1", port=port,
+                                authenticator=accept_any_login, auth_require_tls=False)
+        controller.start()
+        controllers.append(controller)
+
+    yield handler, port, start
+    for controller in controllers:
+        controller.stop()
+
+
+def make_worker(port: int, **options) -> OutboxWorker:
+    return OutboxWorker(AsyncSessionLocal, smtp_host="127.0.0.1", smtp_port=port, smtp_user="admissions@example.com",
+                        smtp_password="secret", starttls=False, **options)
+
+
+async def enqueue(*addresses):
+    async with AsyncSessionLocal() as db:
+        for address in addresses:
+            db.add(EmailOutbox(to_address=address, subject="Admission received", text_body="Hello"))
+        await db.commit()
+
+
+async def outbox_rows() -> dict:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(EmailOutbox).order_by(EmailOutbox.id))).scalars().all()
+    return {row.to_address: row for row in rows}
+
+
+def test_batch_is_sent_over_one_session(db_engine, run_async, smtp_server):
+    handler, port, start = smtp_server
+    start()
+    worker = make_worker(port, batch_size=10)
+
+    async def scenario():
+        await enqueue(*(f"student{i}@example.com" for i in range(5)))
+        assert await worker.drain_once() == 5
+        return await outbox_rows()
+
+    try:
+        rows = run_async(scenario())
+    finally:
+        worker.close()
+    assert {row.status for row in rows.values()} == {"sent"}
+    assert len(handler.messages) == 5
+    assert len({session for session, _ in handler.messages}) == 1  # One SMTP session for the batch
+
+
+def test_550_goes_to_dead_letter(db_engine, run_async, smtp_server):
+    handler, port, start = smtp_server
+    start()
+    worker = make_worker(port)
+
+    async def scenario():
+        await enqueue("bounce@example.com", "ok@example.com")
+        await worker.drain_once()
+        return await outbox_rows()
+
+    try:
+        rows = run_async(scenario())
+    finally:
+        worker.close()
+    bounced = rows["bounce@example.com"]
+    assert (bounced.status, bounced.attempts) == ("dead", 1)
+    assert "550" in bounced.last_error
+    assert rows["ok@example.com"].status == "sent"  # The rest of the batch is unaffected
+    assert [recipients for _, recipients in handler.messages] == [["ok@example.com"]]
+
+
+def test_down_server_is_retried_after_the_lease(db_engine, run_async, smtp_server):
+    handler, port, start = smtp_server
+    worker = make_worker(port, retry_base=0.2, claim_lease=0.5)
+
+    async def scenario():
+        await enqueue("student@example.com")
+
+        # Server down: the message stays pending with a retry time, nothing is dead-lettered
+        assert await worker.drain_once() == 1
+        row = (await outbox_rows())["student@example.com"]
+        assert (row.status, row.attempts) == ("pending", 1)
+        assert await worker.drain_once() == 0  # Not before its backoff
+
+        # A worker that claimed the message and died: nobody sends it until the lease runs out
+        await asyncio.sleep(0.25)
+        assert len(await worker._claim()) == 1
+        assert await worker.drain_once() == 0
+
+        start()
+        deadline = time.monotonic() + 5
+        while await worker.drain_once() == 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return (await outbox_rows())["student@example.com"]
+
+    try:
+        row = run_async(scenario())
+    finally:
+        worker.close()
+    assert (row.status, row.attempts) == ("sent", 2)
+    assert len(handler.messages) == 1
@@ -0,0 +1,67 @@
+import json
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import rule_engine
+import vector_engine
+from benchmarks.profiles import student_profiles, synthetic_kb
+from compact_kb import CompactKB
+from kb_manager import KBSnapshot
+
+# RULE_ENGINE=numpy must rank exactly like the loop engine: same eligible courses,
+# scores, fee tie-breaks and top-k selection, for every KB storage format.
+# Run from backend/: python -m pytest tests
+
+KB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base.json")
+
+
+def load_items() -> list:
+    with open(KB_PATH, "r") as f:
+        return json.load(f)
+
+
+def student(profile: dict) -> SimpleNamespace:
+    return SimpleNamespace(**{"preferred_course": "", "career_interest": "", **profile})
+
+
+def ai_courses(rng: random.Random, items) -> list:
+    """Empty, or a few real course names the way analyze_career_goal returns them."""
+    if rng.random() < 0.5:
+        return []
+    return [items[rng.randrange(len(items))]["course_name"].lower() for _ in range(rng.randint(1, 4))]
+
+
+@pytest.mark.parametrize("kb_format", ["json", "compact", "synthetic"])
+def test_numpy_engine_matches_loop_engine(kb_format):
+    items = load_items()
+    if kb_format == "compact":
+        items = CompactKB.from_items(items)
+    elif kb_format == "synthetic":
+        items = synthetic_kb(items, 3000, seed=7)
+    loop_kb = KBSnapshot("loop", items, "loop")
+    numpy_kb = KBSnapshot("numpy", items, "numpy")
+
+    rng = random.Random(11)
+    profiles = student_profiles(400, seed=3)
+    # Edge marks around the rule thresholds and invalid subject marks
+    profiles += [dict(p, marks=m) for p, m in zip(student_profiles(12, seed=5), (34.99, 35, 59.99, 60, 65, 70, 80))]
+    profiles.append(dict(student_profiles(1, seed=9)[0], subject_marks={"Maths": "A+", "Physics": None}))
+
+    for profile in profiles:
+        flags = rule_engine.build_student_flags(student(profile))
+        ai = ai_courses(rng, loop_kb.items)
+        expected = rule_engine.score_courses(loop_kb.features, loop_kb.fees, flags, ai)
+        actual = vector_engine.score_courses(numpy_kb.arrays, flags, ai)
+        assert sorted(actual) == sorted(expected), profile
+
+        # The /suggest-admission pipeline: rule-only candidates, AI boost, top-k
+        expected = rule_engine.apply_ai_boost(
+            rule_engine.score_courses(loop_kb.features, loop_kb.fees, flags, []), loop_kb.features, flags, ai)
+        actual = rule_engine.apply_ai_boost(
+            vector_engine.score_courses(numpy_kb.arrays, flags, []), numpy_kb.features, flags, ai)
+        expected_top = rule_engine.select_top(expected, loop_kb.features, flags.qualification)
+        actual_top = rule_engine.select_top(actual, numpy_kb.features, flags.qualification)
+        assert actual_top == expected_top, profile
@@ -0,0 +1,47 @@
+import json
+import os
+
+from sqlalchemy import func, select
+
+import kb_store
+from database import SessionLocal
+from models import Course
+
+# Catalogue imports must leave id assignment to the database: ids are never
+# reused and the sequences (PostgreSQL) stay ahead of every row.
+
+KB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base.json")
+
+
+def load_items(n: int) -> list:
+    with open(KB_PATH, "r") as f:
+        return json.load(f)[:n]
+
+
+def active_ids(session) -> list:
+    return [course_id for course_id, _ in kb_store.load_items(session)]
+
+
+def test_import_then_add_course_gets_fresh_ids(db_engine):
+    items = load_items(40)
+    with SessionLocal() as session:
+        assert kb_store.replace_catalogue(session, items) == 40
+        session.commit()
+        first_ids = active_ids(session)
+        assert kb_store.export_items(session) == items  # KB order is file order
+
+        added = kb_store.add_course(session, dict(items[0], course_name="B.Sc Data Science"))
+        session.commit()
+        assert added > max(first_ids)
+
+        kb_store.replace_catalogue(session, items[:30])
+        session.commit()
+        second_ids = active_ids(session)
+        assert len(second_ids) == 30
+        assert min(second_ids) > added  # Not reused from either earlier catalogue
+        assert kb_store.export_items(session) == items[:30]
+
+        added_again = kb_store.add_course(session, dict(items[1], course_name="B.Sc Data Science"))
+        session.commit()
+        assert added_again > max(second_ids)
+        assert session.scalar(select(func.count()).select_from(Course).where(Course.retired.is_(False))) == 31
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import main
+from metrics import ELIGIBLE_COURSES, GROQ_TOKENS
+from result_cache import ResultCache
+
+# Streams and cache hits must show up in /metrics like every other request.
+
+
+def chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=None, x_groq=SimpleNamespace(usage=usage) if usage else None)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.chunks:
+            yield item
+
+    async def close(self):
+        pass
+
+
+def fake_groq(monkeypatch, chunks):
+    async def create(**request):
+        return FakeStream(chunks)
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(main, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+
+def stream_tokens() -> tuple:
+    return tuple(GROQ_TOKENS._values.get(("ai_chat_stream", kind), 0) for kind in ("prompt", "completion"))
+
+
+def chat(run_async, api) -> str:
+    async def scenario():
+        async with api() as client:
+            response = await client.post("/ai-chat/stream", json={"message": "Which colleges offer B.Sc Physics?"})
+            return response.text
+    return run_async(scenario())
+
+
+def test_chat_stream_records_groq_usage(db_engine, run_async, api, monkeypatch):
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=7)
+    fake_groq(monkeypatch, [chunk("Try "), chunk("Bishop Heber."), chunk(usage=usage)])
+    before = stream_tokens()
+    body = chat(run_async, api)
+    assert "Bishop Heber." in body and "event: done" in body
+    after = stream_tokens()
+    assert (after[0] - before[0], after[1] - before[1]) == (120, 7)
+
+
+def test_chat_stream_without_usage_is_estimated(db_engine, run_async, api, monkeypatch):
+    fake_groq(monkeypatch, [chunk("x" * 400)])
+    before = stream_tokens()
+    chat(run_async, api)
+    after = stream_tokens()
+    assert after[0] > before[0]
+    assert after[1] - before[1] == 100
+
+
+def eligible_observations() -> tuple:
+    """(sum, count) of ELIGIBLE_COURSES so far."""
+    _, total, count = ELIGIBLE_COURSES._series.get((), (None, 0.0, 0))
+    return total, count
+
+
+def test_cache_hit_observes_eligible_courses(run_async, monkeypatch):
+    monkeypatch.setattr(main, "suggestion_cache", ResultCache())
+    student = main.StudentInput(name="Asha", dob="2007-05-01", qualification="12th", stream="Science", marks=82)
+    start_sum, start_count = eligible_observations()
+    run_async(main.compute_suggestions(student))
+    miss_sum, miss_count = eligible_observations()
+    run_async(main.compute_suggestions(student))
+    hit_sum, hit_count = eligible_observations()
+    assert main.suggestion_cache.hits == 1
+    assert (miss_count - start_count, hit_count - miss_count) == (1, 1)
+    assert hit_sum - miss_sum == miss_sum - start_sum > 0  # The hit reports the cached eligible count
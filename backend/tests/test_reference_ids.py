@@ -0,0 +1,42 @@
+import asyncio
+
+from database import AsyncSessionLocal
+from models import Application
+from reference_ids import ReferenceAllocator, college_abbreviation
+
+# Reference IDs stay unique across workers reserving blocks concurrently.
+
+COLLEGE = "Trichy College of Arts"  # TCA
+
+
+def add_applications(engine, reference_ids):
+    with engine.begin() as connection:
+        for i, reference_id in enumerate(reference_ids):
+            connection.execute(Application.__table__.insert().values(
+                college=COLLEGE, email=f"old{i}@example.com", phone=f"80000{i:05d}", reference_id=reference_id,
+            ))
+
+
+def test_concurrent_blocks_are_unique_and_skip_random_ids(db_engine, run_async):
+    random_ids = ["TCA202604817", "TCA202600093", "TCA202601555"]
+    add_applications(db_engine, random_ids)
+    workers = [ReferenceAllocator(AsyncSessionLocal, block_size=3) for _ in range(4)]
+
+    async def scenario():
+        return await asyncio.gather(*(
+            worker.allocate(COLLEGE, year=2026) for worker in workers for _ in range(10)
+        ))
+
+    issued = run_async(scenario())
+    assert len(set(issued)) == len(issued) == 40
+    assert all(reference_id.startswith("TCA2026") for reference_id in issued)
+    assert min(int(reference_id[-5:]) for reference_id in issued) > 4817
+    assert sum(worker.reservations for worker in workers) >= 40 // 3
+
+
+def test_prefix_wildcards_are_literal(db_engine, run_async):
+    assert college_abbreviation("A_B") == "A_B"
+    # AXB... matches LIKE 'A_B2026%' but is another prefix's number
+    add_applications(db_engine, ["AXB202600500"])
+    allocator = ReferenceAllocator(AsyncSessionLocal)
+    assert run_async(allocator.allocate("A_B", year=2026)) == "A_B202600001"
@@ -0,0 +1,71 @@
+import pytest
+
+import main
+from benchmarks.profiles import student_profiles
+from kb_manager import KBSnapshot
+from result_cache import MARK_THRESHOLDS, ResultCache, marks_band
+
+# The suggestion cache may only merge profiles the rules cannot tell apart,
+# and must never serve a result from another KB version.
+
+
+@pytest.fixture
+def suggest(run_async, monkeypatch):
+    """suggest(profile, cached=True) -> suggestions, through a fresh suggestion cache."""
+    cache = ResultCache()
+
+    def run(profile: dict, cached: bool = True) -> list:
+        monkeypatch.setattr(main, "suggestion_cache", cache if cached else ResultCache(max_entries=0))
+        suggestions, _ = run_async(main.compute_suggestions(main.StudentInput(**profile)))
+        return suggestions
+    run.cache = cache
+    return run
+
+
+def profile(marks: float, **fields) -> dict:
+    return {
+        "name": "Asha", "dob": "2007-05-01", "qualification": "12th", "stream": "Science", "marks": marks,
+        "subject_marks": {"Maths": 85, "Physics": 82, "Chemistry": 75}, **fields,
+    }
+
+
+@pytest.mark.parametrize("threshold", [35, 60, 65, 70, 80])  # Every marks comparison in the rules
+def test_each_threshold_splits_the_cache(suggest, threshold):
+    below, at, above = profile(threshold - 0.01), profile(threshold), profile(threshold + 4.5)
+    assert suggest(below) == suggest(below, cached=False)
+    assert suggest(at) == suggest(at, cached=False)
+    assert (suggest.cache.misses, suggest.cache.hits) == (2, 0)  # Two separate entries
+    assert suggest(above) == suggest(above, cached=False)  # Same band as `at`
+    assert (suggest.cache.misses, suggest.cache.hits) == (2, 1)
+
+
+def test_kb_version_bump_invalidates(suggest, monkeypatch):
+    student = profile(82)
+    first = suggest(student)
+    top = first[0]
+
+    # A new KB version without the top course
+    kb = main.current_kb()
+    keep = [i for i, item in enumerate(kb.items)
+            if (item["college_name"], item["course_name"]) != (top.college_name, top.course_name)]
+    course_ids = [kb.course_ids[i] for i in keep] if kb.course_ids is not None else None
+    bumped = KBSnapshot(f"{kb.version}-next", [kb.items[i] for i in keep], kb.rule_engine, course_ids)
+    monkeypatch.setattr(main.kb_manager, "snapshot", bumped)
+
+    second = suggest(student)
+    assert suggest.cache.hits == 0 and suggest.cache.kb_version == bumped.version
+    assert (top.college_name, top.course_name) not in {(s.college_name, s.course_name) for s in second}
+    assert second == suggest(student, cached=False)
+
+
+def test_cached_results_equal_uncached(suggest):
+    profiles = []
+    for student in student_profiles(150, seed=7):
+        student["career_interest"] = ""  # No Groq here
+        # A twin in the same marks band shares the cache entry
+        twin = dict(student, name="Twin", marks=(0, *MARK_THRESHOLDS)[marks_band(student["marks"])])
+        profiles += [student, twin]
+
+    for student in profiles:
+        assert suggest(student) == suggest(student, cached=False), student
+    assert suggest.cache.hits >= len(profiles) // 2
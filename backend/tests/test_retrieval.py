@@ -0,0 +1,52 @@
+import json
+import os
+
+from benchmarks.profiles import chat_messages, synthetic_kb
+from compact_kb import CompactKB
+from retrieval import CompactCourseIndex, CourseIndex
+
+# Chat retrieval: acronym expansion must not turn everyday words into search terms.
+
+KB = [
+    {"college_name": "Seshasayee Institute of Technology", "course_name": "Diploma in Mechanical Engineering",
+     "stream_eligibility": ["10th"], "fees": 20000, "address": "Tiruchirappalli"},
+    {"college_name": "Tiruchirappalli Arts College", "course_name": "B.Sc Computer Science",
+     "stream_eligibility": ["Science"], "fees": 30000, "address": "Tiruchirappalli"},
+    {"college_name": "Cauvery College", "course_name": "B.Tech Information Technology (IT)",
+     "stream_eligibility": ["Science"], "fees": 90000},
+    {"college_name": "Cauvery College", "course_name": "Mechanical Engineering",
+     "stream_eligibility": ["Science"], "fees": 80000},
+]
+
+
+def test_lowercase_it_is_not_an_acronym():
+    index = CourseIndex(KB)
+    for query in ("is it good?", "Is it worth it", "it"):
+        terms = index.query_terms(query)
+        assert not {"it", "information", "technology"} & set(terms), query
+    # The question word must not pull in "...Institute of Technology" rows
+    assert index.search("is mechanical engineering good, is it?") == index.search("mechanical engineering")
+
+
+def test_uppercase_it_is_expanded():
+    index = CourseIndex(KB)
+    terms = index.query_terms("Which colleges offer IT?")
+    assert terms["it"] == 1.0 and "information" in terms and "technology" in terms
+    assert index.search("Which colleges offer IT?")[0]["course_name"] == "B.Tech Information Technology (IT)"
+
+
+def test_ai_does_not_match_inside_words():
+    index = CourseIndex(KB)
+    # "ai" is inside "Tiruchirappalli", but only whole words are indexed
+    assert index.search("ai") == []
+    assert index.search("AI courses") == []
+
+
+def test_compact_index_matches_course_index():
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base.json")) as f:
+        kb = CompactKB.from_items(synthetic_kb(json.load(f), 2000, seed=3))
+    expected, actual = CourseIndex(kb), CompactCourseIndex(kb)
+    assert actual.doc_freq == expected.doc_freq and actual.length_totals == expected.length_totals
+    queries = [m["message"] for m in chat_messages(100, seed=5)] + ["engineering", "IT", "is it good?", "zzz"]
+    for query in queries:
+        assert [dict(r) for r in actual.search(query)] == [dict(r) for r in expected.search(query)], query
@@ -0,0 +1,63 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+# Request coalescing: shared calls survive one caller leaving, but not all of them.
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", call) for _ in range(5)))
+        assert results == ["result"] * 5 and len(calls) == 1
+        assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+
+def test_call_survives_while_someone_waits():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        leaving = asyncio.ensure_future(flight.do("key", call))
+        staying = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        assert await staying == "result"
+
+    asyncio.run(scenario())
+
+
+def test_call_cancelled_when_last_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = asyncio.Event()
+        cancelled = []
+
+        async def call():
+            upstream.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        waiter = asyncio.ensure_future(flight.do("key", call))
+        await upstream.wait()
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [1]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import random
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import stats
+from database import AsyncSessionLocal
+from migrations import backfill_counters, migrate
+from models import Application, ApplicationCounter
+
+# The counter tables behind /applications/stats must always equal a GROUP BY over applications.
+
+COLLEGES = ["M.I.E.T Engineering College", "Cauvery College", "Holy Cross College"]
+COURSES = ["BCA", "B.Com", "Mechanical Engineering", None]
+STREAMS = ["Commerce", "Computer Science", None]
+COMMUNITIES = ["OC", "BC", "MBC", "SC", None]
+
+
+def applications(rng: random.Random, start: int, n: int) -> list:
+    return [
+        Application(
+            college=rng.choice(COLLEGES), courseApplied=rng.choice(COURSES), stream=rng.choice(STREAMS),
+            community=rng.choice(COMMUNITIES), studentName=f"Student {i}",
+            email=f"student{i}@example.com", phone=f"90000{i:05d}",
+        )
+        for i in range(start, start + n)
+    ]
+
+
+def grouped(engine) -> dict:
+    expected = {}
+    with engine.connect() as connection:
+        for dimension in stats.DIMENSIONS:
+            column = func.coalesce(Application.__table__.c[dimension], "")
+            for value, count in connection.execute(select(column, func.count()).group_by(column)):
+                expected[(dimension, value)] = count
+    return expected
+
+
+def counters(engine) -> dict:
+    with engine.connect() as connection:
+        rows = connection.execute(select(ApplicationCounter.dimension, ApplicationCounter.value, ApplicationCounter.count))
+        return {(dimension, value): count for dimension, value, count in rows if count}
+
+
+def submit(run_async, rows: list):
+    async def scenario():
+        for application in rows:
+            async with AsyncSessionLocal() as db:
+                db.add(application)
+                await db.flush()
+                await stats.increment_counters(db, application)
+                await db.commit()
+    run_async(scenario())
+
+
+def test_backfill_matches_group_by(db_engine):
+    with Session(db_engine) as session:
+        session.add_all(applications(random.Random(1), 0, 60))
+        session.commit()
+    assert counters(db_engine) == {}
+    backfill_counters(db_engine)
+    assert counters(db_engine) == grouped(db_engine)
+
+    # Counters that already exist are left alone (no double counting on the next start)
+    migrate()
+    assert counters(db_engine) == grouped(db_engine)
+
+
+def test_increments_match_group_by(db_engine, run_async, monkeypatch):
+    rng = random.Random(2)
+    submit(run_async, applications(rng, 0, 40))
+    assert counters(db_engine) == grouped(db_engine)
+
+    # Databases without ON CONFLICT: update, then insert in a savepoint
+    monkeypatch.setattr(stats, "UPSERT_DIALECTS", {})
+    submit(run_async, applications(rng, 40, 40))
+    assert counters(db_engine) == grouped(db_engine)
+
+
+def test_read_stats_totals(db_engine, run_async):
+    submit(run_async, applications(random.Random(3), 0, 25))
+
+    async def read():
+        async with AsyncSessionLocal() as db:
+            return await stats.read_stats(db)
+
+    result = run_async(read())
+    assert result["total"] == 25
+    assert sum(result["community"].values()) == 25
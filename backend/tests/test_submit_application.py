@@ -0,0 +1,59 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from models import Application
+
+# Double-clicks and concurrent duplicate submits must never create two rows.
+
+FORM = {
+    "college": "M.I.E.T Engineering College", "studentName": "Asha", "parentName": "Ravi",
+    "email": "asha@example.com", "phone": "9000000001", "gender": "Female", "dob": "2007-05-01",
+    "community": "BC", "address": "Trichy", "qualification": "12th", "stream": "Computer Science",
+    "marksPercentage": "82", "courseApplied": "Computer Science Engineering",
+}
+
+
+def count_rows(engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Application)).scalar()
+
+
+def test_concurrent_duplicate_submits_store_one_row(db_engine, run_async, api):
+    async def scenario():
+        async with api() as client:
+            return await asyncio.gather(*(client.post("/submit-application", json=FORM) for _ in range(8)))
+
+    responses = run_async(scenario())
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] + [400] * 7
+    assert all("already submitted" in r.json()["detail"] for r in responses if r.status_code == 400)
+    assert count_rows(db_engine) == 1
+
+
+def test_same_phone_or_email_is_a_duplicate(db_engine, run_async, api):
+    async def scenario():
+        async with api() as client:
+            first = await client.post("/submit-application", json=FORM)
+            same_phone = await client.post("/submit-application", json=dict(FORM, email="other@example.com"))
+            same_email = await client.post("/submit-application", json=dict(FORM, phone="9000000002"))
+            other_college = await client.post("/submit-application", json=dict(FORM, college="Cauvery College"))
+            return first, same_phone, same_email, other_college
+
+    first, same_phone, same_email, other_college = run_async(scenario())
+    assert (first.status_code, same_phone.status_code, same_email.status_code, other_college.status_code) == (200, 400, 400, 200)
+    assert count_rows(db_engine) == 2
+
+
+def test_rejected_duplicate_does_not_take_a_reference_number(db_engine, run_async, api):
+    async def scenario():
+        async with api() as client:
+            first = await client.post("/submit-application", json=FORM)
+            duplicate = await client.post("/submit-application", json=FORM)
+            second = await client.post("/submit-application", json=dict(FORM, email="b@example.com", phone="9000000002"))
+            return first, duplicate, second
+
+    first, duplicate, second = run_async(scenario())
+    assert duplicate.status_code == 400
+    first_number, second_number = (int(r.json()["reference_id"][-5:]) for r in (first, second))
+    assert second_number == first_number + 1
@@ -0,0 +1,216 @@
+import numpy as np
+
+from course_features import (
+    CATEGORY_ENGINEERING, CATEGORY_BSC, CATEGORY_BCA, CATEGORY_COMMERCE, CATEGORY_ARTS,
+    BSC_COMPUTER, BSC_BIO,
+)
+from rule_engine import StudentFlags
+from profiling import lap
+
+# Columnar (NumPy) version of rule_engine.score_courses.
+# Eligibility and relevance_score are computed for the whole catalogue with a few
+# array operations; selection and match_reason strings are shared with the loop
+# engine (rule_engine.select_top / match_reason).
+# Must return exactly the same candidates as rule_engine.score_courses.
+
+
+class CourseArrays:
+    """Knowledge base stored as column arrays, built once in load_kb()."""
+
+    # CourseFeatures attribute -> column dtype
+    FEATURE_COLUMNS = {
+        "is_diploma": bool, "category": np.int8, "bsc_kind": np.int8, "is_bio_engineering": bool,
+        "is_computer": bool, "is_engineering": bool, "is_high_demand": bool, "is_bio": bool,
+        "is_computer_career": bool, "is_medical_career": bool,
+    }
+
+    def __init__(self, features: list, kb: list):
+        self.size = len(features)
+
+        for attr, dtype in self.FEATURE_COLUMNS.items():
+            setattr(self, attr, np.fromiter((getattr(f, attr) for f in features), dtype=dtype, count=self.size))
+        columns = getattr(kb, "columns", None)  # CompactKB: read straight from the records
+        if columns is not None:
+            self.fees = columns["fees"].astype(np.int64)
+            self.minimum_marks = np.nan_to_num(columns["minimum_marks"], nan=0.0)
+        else:
+            self.fees = np.fromiter((item["fees"] for item in kb), dtype=np.int64, count=self.size)
+            self.minimum_marks = np.fromiter((item.get("minimum_marks", 0) for item in kb), dtype=np.float64, count=self.size)
+
+        # Course names repeat across colleges, so name matching (AI list, preferred
+        # course) runs over the unique names and is mapped back via name_ids.
+        if columns is not None:
+            # Per interned name (two ids may share a lowercased name; name_mask doesn't mind)
+            _, first, self.name_ids = np.unique(columns["name_id"], return_index=True, return_inverse=True)
+            self.names = [features[position].name_lower for position in first.tolist()]
+        else:
+            self.names, self.name_ids = np.unique([f.name_lower for f in features], return_inverse=True)
+            self.names = self.names.tolist()
+        self.name_ids = self.name_ids.reshape(-1)
+
+        # Fallback eligibility: one mask per stream listed in the KB
+        self.stream_masks = {}
+        for i, f in enumerate(features):
+            for stream in f.stream_eligibility:
+                if stream not in self.stream_masks:
+                    self.stream_masks[stream] = np.zeros(self.size, dtype=bool)
+                self.stream_masks[stream][i] = True
+
+    def patched(self, features: list, kb: list, source: np.ndarray, dirty: list) -> "CourseArrays":
+        """Columns for a changed KB without rebuilding them.
+
+        source[i] is the position in this KB that row i is copied from (-1 for a new
+        course) and dirty lists the rows (changed or new) that are filled in from
+        features / kb afterwards. This instance is left untouched.
+        """
+        arrays = object.__new__(CourseArrays)
+        arrays.size = len(features)
+        take = np.maximum(source, 0)
+
+        def gather(column):
+            return column[take] if self.size else np.zeros(arrays.size, dtype=column.dtype)
+
+        for attr in self.FEATURE_COLUMNS:
+            column = gather(getattr(self, attr))
+            for i in dirty:
+                column[i] = getattr(features[i], attr)
+            setattr(arrays, attr, column)
+        arrays.fees = gather(self.fees)
+        arrays.minimum_marks = gather(self.minimum_marks)
+        for i in dirty:
+            arrays.fees[i] = kb[i]["fees"]
+            arrays.minimum_marks[i] = kb[i].get("minimum_marks", 0)
+
+        # Unused names may linger in names; name_mask only looks at the ids in use
+        arrays.names = list(self.names)
+        name_ids = {name: i for i, name in enumerate(arrays.names)}
+        arrays.name_ids = gather(self.name_ids)
+        for i in dirty:
+            name = features[i].name_lower
+            if name not in name_ids:
+                name_ids[name] = len(arrays.names)
+                arrays.names.append(name)
+            arrays.name_ids[i] = name_ids[name]
+
+        arrays.stream_masks = {stream: gather(mask) for stream, mask in self.stream_masks.items()}
+        for i in dirty:
+            for mask in arrays.stream_masks.values():
+                mask[i] = False
+            for stream in features[i].stream_eligibility:
+                if stream not in arrays.stream_masks:
+                    arrays.stream_masks[stream] = np.zeros(arrays.size, dtype=bool)
+                arrays.stream_masks[stream][i] = True
+        return arrays
+
+    def name_mask(self, predicate) -> np.ndarray:
+        """Boolean mask of courses whose lowercased name satisfies predicate."""
+        hits = np.fromiter((predicate(name) for name in self.names), dtype=bool, count=len(self.names))
+        return hits[self.name_ids]
+
+
+def score_courses(arrays: CourseArrays, flags: StudentFlags, ai_suggested_courses_lower: list) -> list:
+    """Vectorized RULES 1-6. Same contract as rule_engine.score_courses."""
+    # RULE 3 hard limit from chatflow.md: below 35% nothing is eligible
+    if flags.marks < 35 or arrays.size == 0:
+        return []
+
+    marks = flags.marks
+    stream = flags.stream
+    is_diploma = arrays.is_diploma
+    size = arrays.size
+
+    # ==========================================
+    #  RULE 1 + RULE 2: Qualification / Stream eligibility
+    # ==========================================
+    if flags.qualification == "10th":
+        eligible = is_diploma.copy()
+    elif flags.qualification == "12th":
+        category = arrays.category
+
+        # A. ENGINEERING
+        if stream in ["Commerce", "Arts"]:
+            engineering_ok = np.zeros(size, dtype=bool)
+        elif stream == "Vocational":
+            engineering_ok = np.ones(size, dtype=bool)
+        else:
+            if stream == "Biology" and not flags.has_math:
+                engineering_ok = arrays.is_bio_engineering.copy()
+            elif flags.has_math or flags.has_physics:
+                engineering_ok = np.ones(size, dtype=bool)
+            else:
+                engineering_ok = np.zeros(size, dtype=bool)
+            if stream != "Computer Science" and not (flags.has_math or flags.has_computer):
+                engineering_ok &= ~arrays.is_computer
+
+        # B. ARTS & SCIENCE
+        bsc_kind = arrays.bsc_kind
+        bsc_ok = np.where(
+            bsc_kind == BSC_COMPUTER, stream == "Computer Science" or flags.has_math or flags.has_computer,
+            np.where(bsc_kind == BSC_BIO, stream == "Biology" or flags.has_bio_subject,
+                     stream not in ["Commerce", "Arts"]),
+        )
+        commerce_ok = stream == "Commerce" or flags.has_commerce_subject
+        fallback_ok = arrays.stream_masks.get(stream)
+        if fallback_ok is None:
+            fallback_ok = np.zeros(size, dtype=bool)
+
+        degree_ok = np.select(
+            [category == CATEGORY_ENGINEERING, category == CATEGORY_BSC, category == CATEGORY_BCA,
+             category == CATEGORY_COMMERCE, category == CATEGORY_ARTS],
+            [engineering_ok, bsc_ok, True, commerce_ok, True],
+            default=fallback_ok,
+        )
+        eligible = is_diploma | degree_ok
+    else:
+        return []
+
+    # ==========================================
+    #  RULE 3: Percentage Logic (Tiered)
+    # ==========================================
+    engineering_degree = arrays.is_engineering & ~is_diploma
+    if marks < 60 and stream != "Vocational":
+        eligible &= ~engineering_degree
+    if marks < 65:
+        eligible &= ~(engineering_degree & arrays.is_high_demand)
+
+    indices = np.flatnonzero(eligible)
+    lap("eligibility")
+    if indices.size == 0:
+        return []
+
+    # ==========================================
+    #  SCORING: Rules 4, 5, 6
+    # ==========================================
+    scores = np.full(size, 50, dtype=np.int64)
+    if marks >= 80:
+        scores += 20
+    elif marks >= 70:
+        scores += 10
+
+    scores += arrays.is_engineering * (15 * flags.strong_math + 10 * flags.strong_physics)
+    if flags.strong_bio:
+        scores += arrays.is_bio * 15
+
+    if flags.has_career:
+        if flags.wants_computer:
+            scores += arrays.is_computer_career * 25
+        elif flags.wants_medical:
+            scores += arrays.is_medical_career * 50
+        if ai_suggested_courses_lower:
+            ai_names = set(ai_suggested_courses_lower)
+            scores += arrays.name_mask(lambda name: name in ai_names) * 40
+
+    if flags.qualification == "12th":
+        if marks < 65:
+            scores += is_diploma * 25
+        else:
+            scores += is_diploma * 5
+        if marks >= 70:
+            scores += ~is_diploma * 15
+
+    if flags.preferred_lower:
+        preferred = flags.preferred_lower
+        scores += arrays.name_mask(lambda name: preferred in name) * 100
+
+    lap("scoring")
+    return list(zip((-scores[indices]).tolist(), arrays.fees[indices].tolist(), indices.tolist()))
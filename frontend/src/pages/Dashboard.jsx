@@ -2,9 +2,15 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import toast from 'react-hot-toast';
 
+const PAGE_SIZE = 100;
+
 const Dashboard = () => {
+    const [stats, setStats] = useState(null);
     const [applications, setApplications] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [selectedCollege, setSelectedCollege] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const navigate = useNavigate();
     const currentUser = localStorage.getItem('username');
 
@@ -14,79 +20,94 @@ const Dashboard = () => {
             navigate('/login');
             return;
         }
-        fetchApplications();
+        fetchStats();
     }, [navigate]);
 
-    const fetchApplications = async () => {
+    // Counts come from the server's counter tables (/applications/stats), so the
+    // dashboard never downloads every application just to build the college list.
+    const fetchStats = async () => {
         try {
-            const response = await fetch('http://localhost:8000/applications');
-            if (response.ok) {
-                const data = await response.json();
-
-                // Filter logic based on logged in user:
-                // If user is 'miet', only show TRP Engg College (placeholder logic)
-                // In a real app we'd map this server side, but since the request asks for 'college wise view', 
-                // we'll filter on the frontend for simplicity based on the knowledge base names.
-
-                let filteredData = data;
-                // 'admin' can see all
-                if (currentUser === 'admin') {
-                    filteredData = data;
-                }
-                if (currentUser === 'miet') {
-                    filteredData = data.filter(app => app.college.toLowerCase().includes('trp') || app.college.toLowerCase().includes('miet'));
-                } else if (currentUser === 'shaji') {
-                    filteredData = data.filter(app => app.college.toLowerCase().includes('srm') || app.college.toLowerCase().includes('shaji'));
-                }
-
-                // If they don't explicitly belong to the hardcoded prefixes, show all or build a drop down filter.
-                // Let's implement a universal dropdown filter instead so it's fully functional.
-
-                setApplications(data); // Store all, filter visually
-            } else {
+            const response = await fetch('http://localhost:8000/applications/stats');
+            if (!response.ok) {
                 toast.error('Failed to load applications');
+                setLoading(false);
+                return;
+            }
+            const data = await response.json();
+            setStats(data);
+
+            // Default filter based on username
+            const names = Object.keys(data.college);
+            let college = 'All';
+            if (currentUser === 'miet') {
+                college = names.find(c => c.toLowerCase().includes('trp')) || 'All';
+            } else if (currentUser === 'shaji') {
+                college = names.find(c => c.toLowerCase().includes('srm')) || 'All';
             }
+            setSelectedCollege(college);
         } catch (error) {
             console.error('Fetch error:', error);
             toast.error('Error connecting to server.');
-        } finally {
             setLoading(false);
         }
     };
 
-    const handleLogout = () => {
-        localStorage.removeItem('auth_token');
-        localStorage.removeItem('username');
-        navigate('/login');
+    // One page of the selected college's applications (filtered server side)
+    const fetchPage = async (college, afterId) => {
+        const params = new URLSearchParams({ limit: PAGE_SIZE, after_id: afterId });
+        if (college !== 'All') params.set('college', college);
+        const response = await fetch(`http://localhost:8000/applications?${params}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return { rows: await response.json(), cursor: response.headers.get('X-Next-Cursor') };
     };
 
-    // Derived state for filtering
-    const [selectedCollege, setSelectedCollege] = useState('All');
-
-    // Get unique colleges from applications
-    const colleges = ['All', ...new Set(applications.map(app => app.college))];
-
-    // Default filter based on username 
     useEffect(() => {
-        if (applications.length > 0) {
-            if (currentUser === 'admin') {
-                setSelectedCollege('All');
-            } else if (currentUser === 'miet') {
-                const mietCollege = colleges.find(c => c.toLowerCase().includes('trp'));
-                if (mietCollege) setSelectedCollege(mietCollege);
-            } else if (currentUser === 'shaji') {
-                const shajiCollege = colleges.find(c => c.toLowerCase().includes('srm'));
-                if (shajiCollege) setSelectedCollege(shajiCollege);
-            }
+        if (selectedCollege === null) return;
+        let cancelled = false;
+        setLoading(true);
+        fetchPage(selectedCollege, 0)
+            .then(({ rows, cursor }) => {
+                if (cancelled) return;
+                setApplications(rows);
+                setNextCursor(cursor);
+            })
+            .catch((error) => {
+                console.error('Fetch error:', error);
+                if (!cancelled) toast.error('Failed to load applications');
+            })
+            .finally(() => {
+                if (!cancelled) setLoading(false);
+            });
+        return () => { cancelled = true; };
+    }, [selectedCollege]);
+
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const { rows, cursor } = await fetchPage(selectedCollege, nextCursor);
+            setApplications(previous => previous.concat(rows));
+            setNextCursor(cursor);
+        } catch (error) {
+            console.error('Fetch error:', error);
+            toast.error('Failed to load applications');
+        } finally {
+            setLoadingMore(false);
         }
-    }, [applications.length, currentUser, colleges]);
+    };
 
+    const handleLogout = () => {
+        localStorage.removeItem('auth_token');
+        localStorage.removeItem('username');
+        navigate('/login');
+    };
 
-    const displayedApplications = selectedCollege === 'All'
-        ? applications
-        : applications.filter(app => app.college === selectedCollege);
+    const collegeCounts = stats ? stats.college : {};
+    const colleges = ['All', ...Object.keys(collegeCounts).filter(Boolean).sort()];
+    const selectedTotal = selectedCollege === 'All' || selectedCollege === null
+        ? (stats ? stats.total : 0)
+        : (collegeCounts[selectedCollege] || 0);
 
-    if (loading) return <div className="container" style={{ padding: '4rem 2rem', textAlign: 'center' }}>Loading data...</div>;
+    if (loading && applications.length === 0) return <div className="container" style={{ padding: '4rem 2rem', textAlign: 'center' }}>Loading data...</div>;
 
     return (
         <div className="container" style={{ padding: '2rem 0' }}>
@@ -102,24 +123,25 @@ const Dashboard = () => {
                 <div style={{ display: 'flex', alignItems: 'center', gap: '1rem' }}>
                     <label style={{ fontWeight: 'bold' }}>Filter by College:</label>
                     <select
-                        value={selectedCollege}
+                        value={selectedCollege || 'All'}
                         onChange={(e) => setSelectedCollege(e.target.value)}
                         style={{ maxWidth: '400px' }}
                     >
                         {colleges.map((c, idx) => (
-                            <option key={idx} value={c}>{c}</option>
+                            <option key={idx} value={c}>{c} ({c === 'All' ? (stats ? stats.total : 0) : collegeCounts[c]})</option>
                         ))}
                     </select>
+                    <span style={{ color: 'var(--text-muted)' }}>{selectedTotal} application{selectedTotal === 1 ? '' : 's'}</span>
                 </div>
             </div>
 
-            {displayedApplications.length === 0 ? (
+            {applications.length === 0 ? (
                 <div className="glass-card section-card" style={{ textAlign: 'center', padding: '3rem' }}>
                     <h3>No applications found for this college yet.</h3>
                 </div>
             ) : (
                 <div className="results-grid">
-                    {displayedApplications.map((app) => (
+                    {applications.map((app) => (
                         <div key={app.id} className="glass-card" style={{ padding: '1.5rem', display: 'flex', flexDirection: 'column', gap: '0.5rem' }}>
                             <div style={{ display: 'flex', justifyContent: 'space-between', borderBottom: '1px solid var(--border-color)', paddingBottom: '0.5rem', marginBottom: '0.5rem' }}>
                                 <strong>{app.studentName}</strong>
@@ -146,6 +168,14 @@ const Dashboard = () => {
                     ))}
                 </div>
             )}
+
+            {nextCursor && (
+                <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+                    <button onClick={loadMore} className="btn btn-secondary" disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : `Load more (${applications.length} of ${selectedTotal})`}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };